@@ -1,4 +1,3 @@
 #!/usr/bin/bash
 
-./src/main.py
-cd docs && python3 -m http.server 8888
+./src/main.py --watch --port 8888
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+import os, sys, json, time, random, argparse, platform, tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from markdown_formatting import parse_blocks, block_to_html_node
+from parentnode import ParentNode
+from manifest import new_manifest
+from main import generate_pages_recursive
+
+WORDS = (
+    "the ring of power was forged in the fires of mount doom by sauron "
+    "and elves of eregion who never knew the dark lord had deceived them"
+).split()
+DEFAULT_MIX = {"paragraph": 6, "heading": 2, "list": 2, "code": 1, "quote": 1}
+TEMPLATE = """<!doctype html>
+<html>
+  <head>
+    <title>{{ Title }}</title>
+    <link href="/index.css" rel="stylesheet" />
+  </head>
+  <body>
+    <article>{{ Content }}</article>
+  </body>
+</html>
+"""
+
+
+# Returns a line of random words where roughly inline_density of the words carry
+# inline markup (bold, italic, code, links or images)
+def random_line(rng, words, inline_density):
+    parts = []
+    for _ in range(words):
+        word = rng.choice(WORDS)
+        if rng.random() < inline_density:
+            word = rng.choice(
+                [
+                    f"**{word}**",
+                    f"_{word}_",
+                    f"`{word}`",
+                    f"[{word}](/blog/{word})",
+                    f"![{word}](/images/{word}.png)",
+                ]
+            )
+        parts.append(word)
+    return " ".join(parts)
+
+
+# Returns a random markdown block of the given kind
+def random_block(rng, kind, inline_density):
+    if kind == "heading":
+        return "#" * rng.randint(2, 4) + " " + random_line(rng, 5, inline_density)
+    if kind == "list":
+        items = rng.randint(2, 6)
+        if rng.random() < 0.5:
+            lines = [f"- {random_line(rng, 10, inline_density)}" for _ in range(items)]
+        else:
+            lines = [
+                f"{i + 1}. {random_line(rng, 10, inline_density)}" for i in range(items)
+            ]
+        return "\n".join(lines)
+    if kind == "code":
+        lines = [random_line(rng, 6, 0) for _ in range(rng.randint(2, 8))]
+        return "```\n" + "\n".join(lines) + "\n```"
+    if kind == "quote":
+        lines = rng.randint(1, 3)
+        return "\n".join(
+            f"> {random_line(rng, 12, inline_density)}" for _ in range(lines)
+        )
+    return "\n".join(
+        random_line(rng, 15, inline_density) for _ in range(rng.randint(1, 5))
+    )
+
+
+# Returns the markdown of one page with the given number of blocks
+def random_page(rng, title, blocks, inline_density, mix):
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+    parts = [f"# {title}"]
+    for kind in rng.choices(kinds, weights, k=blocks):
+        parts.append(random_block(rng, kind, inline_density))
+    return "\n\n".join(parts) + "\n"
+
+
+# Writes a synthetic site (content/ and template.html) into path.
+# The same arguments always produce the same corpus.
+def generate_corpus(path, pages, blocks, inline_density=0.2, mix=None, seed=0):
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    for i in range(pages):
+        # Spread the pages over a few levels of directories
+        page_dir = os.path.join(path, "content", f"section{i % 10}", f"page{i}")
+        os.makedirs(page_dir, exist_ok=True)
+        with open(os.path.join(page_dir, "index.md"), "w") as f:
+            f.write(random_page(rng, f"Page {i}", blocks, inline_density, mix))
+    with open(os.path.join(path, "template.html"), "w") as f:
+        f.write(TEMPLATE)
+
+
+# Returns the markdown of every page of a corpus
+def read_corpus(path):
+    sources = []
+    for root, _, names in os.walk(os.path.join(path, "content")):
+        for name in sorted(names):
+            with open(os.path.join(root, name)) as f:
+                sources.append(f.read())
+    return sources
+
+
+# Runs func repeat times and returns the fastest wall-clock time in seconds
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# Times each pipeline stage separately and the end-to-end build of a corpus
+def run_benchmarks(path, repeat):
+    sources = read_corpus(path)
+    lines = [source.split("\n") for source in sources]
+    blocks = [list(parse_blocks(page)) for page in lines]
+    trees = [
+        ParentNode("div", [block_to_html_node(*block) for block in page])
+        for page in blocks
+    ]
+
+    def parse_all_blocks():
+        for page in lines:
+            for _ in parse_blocks(page):
+                pass
+
+    def parse_all_inline():
+        for page in blocks:
+            for block in page:
+                block_to_html_node(*block)
+
+    def render_all():
+        for tree in trees:
+            tree.to_html()
+
+    content = os.path.join(path, "content")
+    template = os.path.join(path, "template.html")
+    dest = os.path.join(path, "docs")
+    manifest = new_manifest()
+
+    def full_build():
+        with redirect_stdout(StringIO()):
+            generate_pages_recursive(content, template, dest, "/", None)
+
+    def incremental_build():
+        with redirect_stdout(StringIO()):
+            generate_pages_recursive(content, template, dest, "/", manifest)
+
+    results = {
+        "blocks": best_time(parse_all_blocks, repeat),
+        "inline": best_time(parse_all_inline, repeat),
+        "render": best_time(render_all, repeat),
+        "build": best_time(full_build, repeat),
+    }
+    # Fill the manifest so the incremental build has nothing to do. This runs after
+    # the full builds, which rewrite every output and would make the first timed
+    # incremental build a full one.
+    incremental_build()
+    results["incremental_build"] = best_time(incremental_build, repeat)
+    return results
+
+
+# Compares results against a baseline and returns the stages that became slower
+# than the tolerance allows, as (stage, baseline seconds, current seconds)
+def find_regressions(baseline, results, tolerance):
+    regressions = []
+    for stage, seconds in results["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if base and seconds > base * (1 + tolerance):
+            regressions.append((stage, base, seconds))
+    return regressions
+
+
+# Parses a block mix such as "paragraph=6,list=2,code=1"
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        kind, weight = item.split("=")
+        if kind not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown block kind {kind}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the site generator")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--blocks", type=int, default=40, help="blocks per page")
+    parser.add_argument(
+        "--inline-density",
+        type=float,
+        default=0.2,
+        help="fraction of words with inline markup",
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="relative weights of block kinds, e.g. paragraph=6,list=2,code=1,quote=1",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="allowed slowdown against the baseline (default: 0.2 = 20%%)",
+    )
+    args = parser.parse_args()
+
+    config = {
+        "pages": args.pages,
+        "blocks": args.blocks,
+        "inline_density": args.inline_density,
+        "mix": args.mix,
+        "seed": args.seed,
+    }
+    with tempfile.TemporaryDirectory() as path:
+        generate_corpus(
+            path, args.pages, args.blocks, args.inline_density, args.mix, args.seed
+        )
+        stages = run_benchmarks(path, args.repeat)
+    results = {
+        "config": config,
+        "python": platform.python_version(),
+        "stages": stages,
+    }
+
+    for stage, seconds in stages.items():
+        print(f"{stage:>20}: {seconds * 1000:10.2f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("Warning: the baseline was recorded with a different corpus")
+        regressions = find_regressions(baseline, results, args.tolerance)
+        for stage, base, seconds in regressions:
+            print(
+                f"Regression in {stage}: {base * 1000:.2f} ms -> {seconds * 1000:.2f} ms"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os, gzip
+from concurrent.futures import ProcessPoolExecutor
+from manifest import output_stat, remove_empty_dirs, write_file
+
+# Outputs that are worth compressing, other formats such as PNG are compressed already
+COMPRESSIBLE_EXTENSIONS = {".html", ".css", ".js", ".svg", ".json", ".xml", ".txt"}
+# Files smaller than this fit in a single packet anyway
+MIN_SIZE = 256
+# A compressed variant is only kept if it is at most this fraction of the original
+MAX_RATIO = 0.9
+
+
+def is_compressible(rel_path):
+    return os.path.splitext(rel_path)[1].lower() in COMPRESSIBLE_EXTENSIONS
+
+
+# Returns the data compressed with gzip, or None if that does not save enough bytes
+def gzip_bytes(data):
+    if len(data) < MIN_SIZE:
+        return None
+    # mtime=0 makes the output depend on the contents only
+    compressed = gzip.compress(data, 9, mtime=0)
+    return compressed if len(compressed) <= len(data) * MAX_RATIO else None
+
+
+# Writes path.gz next to a file if compression saves enough bytes, otherwise removes
+# an existing path.gz. Returns (original size, compressed size or None).
+def compress_file(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    gz_path = path + ".gz"
+    compressed = gzip_bytes(data)
+    if compressed is not None:
+        write_file(gz_path, compressed)
+        return len(data), len(compressed)
+    if os.path.exists(gz_path):
+        os.remove(gz_path)
+    return len(data), None
+
+
+# Writes gzip-compressed siblings (index.html.gz) of the given output files.
+# The "compressed" section of the manifest records the output each sibling was
+# compressed from, so only new or changed outputs are compressed again. Siblings of
+# outputs that are no longer listed are removed. With workers > 1, files are compressed
+# in a pool of worker processes.
+def precompress_outputs(dest, manifest, rel_paths, workers=1):
+    old_entries = manifest["compressed"]
+    new_entries = {}
+    pending = []
+    for rel_path in rel_paths:
+        if not is_compressible(rel_path):
+            continue
+        path = os.path.join(dest, rel_path)
+        output = output_stat(path)
+        if output is None:
+            continue
+        previous = old_entries.get(rel_path)
+        if (
+            previous
+            and previous["output"] == output
+            and previous["gz"] == output_stat(path + ".gz")
+        ):
+            new_entries[rel_path] = previous
+        else:
+            new_entries[rel_path] = {"output": output}
+            pending.append(rel_path)
+
+    paths = [os.path.join(dest, rel_path) for rel_path in pending]
+    if workers <= 1 or len(paths) <= 1:
+        results = [compress_file(path) for path in paths]
+    else:
+        workers = min(workers, len(paths))
+        chunksize = max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(compress_file, paths, chunksize=chunksize))
+    for rel_path, path in zip(pending, paths):
+        new_entries[rel_path]["gz"] = output_stat(path + ".gz")
+
+    removed = 0
+    for rel_path in sorted(set(old_entries) - set(new_entries)):
+        gz_path = os.path.join(dest, rel_path) + ".gz"
+        if old_entries[rel_path]["gz"] and os.path.isfile(gz_path):
+            os.remove(gz_path)
+            removed += 1
+            remove_empty_dirs(os.path.dirname(gz_path), dest)
+    manifest["compressed"] = new_entries
+
+    written = [sizes for sizes in results if sizes[1] is not None]
+    saved = sum(size - compressed for size, compressed in written)
+    print(
+        f"Precompressed {len(written)} of {len(pending)} changed outputs "
+        f"({saved // 1024} KiB saved), {removed} removed, "
+        f"{len(new_entries) - len(pending)} unchanged"
+    )
@@ -0,0 +1,97 @@
+import os, json, hashlib
+from manifest import write_file
+
+# Bump when the parser or renderer changes its output, so cached fragments are not reused
+PARSER_VERSION = 1
+DEFAULT_CACHE_SIZE = 256 * 1024 * 1024
+# Marks the URLs of links and images in rendered fragments. Sources containing it are
+# not cached.
+URL_MARKER = "\0"
+
+
+# Rendered page content with its URLs still root-relative, as stored in the cache.
+# parts alternates between HTML and URLs: ["<p><a href=\"", "/blog", "\">Blog</a></p>"].
+# The URLs are rewritten when the content is written into a page, so the same fragment
+# serves every basepath, URL mode and template.
+class CachedContent:
+    def __init__(self, parts, rewrite_url=None):
+        self.parts = parts
+        self.rewrite_url = rewrite_url
+
+    def render_to(self, writer):
+        parts = self.parts
+        rewrite_url = self.rewrite_url
+        for i in range(0, len(parts), 2):
+            writer.write(parts[i])
+            if i + 1 < len(parts):
+                url = parts[i + 1]
+                writer.write(rewrite_url(url) if rewrite_url else url)
+
+    def __repr__(self):
+        return f"CachedContent({self.parts})"
+
+
+# Returns the URL rewriter used while rendering content for the cache
+def mark_url(url):
+    return URL_MARKER + url + URL_MARKER
+
+
+# Splits content rendered with mark_url into HTML and URL parts
+def split_marked(html):
+    return html.split(URL_MARKER)
+
+
+# On-disk cache of rendered page content and titles, keyed by the source hash and the
+# parser version. Entries are JSON files under path, and their mtime records when they
+# were last used so evict can remove the least recently used ones first.
+class ContentCache:
+    def __init__(self, path, max_size=DEFAULT_CACHE_SIZE):
+        self.path = path
+        self.max_size = max_size
+
+    def entry_path(self, source_hash):
+        key = hashlib.sha256(f"{PARSER_VERSION}:{source_hash}".encode()).hexdigest()
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    # Returns (title, parts) for a source hash, or None if it is not cached
+    def get(self, source_hash):
+        path = self.entry_path(source_hash)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry["title"], entry["parts"]
+
+    # Stores an entry, written atomically as pages rendered in parallel may read it
+    def put(self, source_hash, title, parts):
+        path = self.entry_path(source_hash)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_file(path, json.dumps({"title": title, "parts": parts}).encode())
+
+    # Removes the least recently used entries until the cache fits in max_size bytes.
+    # Returns the number of removed entries.
+    def evict(self):
+        entries = []
+        total = 0
+        for root, _, names in os.walk(self.path):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+                total += st.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            os.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def __repr__(self):
+        return f"ContentCache({self.path}, {self.max_size})"
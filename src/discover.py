@@ -0,0 +1,84 @@
+import os, fnmatch
+
+# Sources in the content directory that are pages, other files there are ignored
+PAGE_EXTENSIONS = (".md",)
+
+
+# A file found by scan_tree, with the size and mtime of the stat taken while scanning
+class SourceFile:
+    __slots__ = ("path", "rel_path", "size", "mtime_ns")
+
+    def __init__(self, path, rel_path, size, mtime_ns):
+        self.path = path
+        self.rel_path = rel_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    # Returns the stat data in the form recorded in the manifest
+    def stat(self):
+        return {"size": self.size, "mtime_ns": self.mtime_ns}
+
+    def __repr__(self):
+        return f"SourceFile({self.rel_path}, {self.size}, {self.mtime_ns})"
+
+
+# Checks whether a path relative to the scanned directory matches one of the globs.
+# Globs without a slash match the name of a file or directory (*.tmp), others the
+# whole relative path (drafts/*).
+def matches(rel_path, patterns):
+    glob_path = rel_path.replace(os.sep, "/")
+    name = os.path.basename(rel_path)
+    for pattern in patterns:
+        if fnmatch.fnmatchcase(glob_path if "/" in pattern else name, pattern):
+            return True
+    return False
+
+
+# Lists the files under root as SourceFiles, sorted by relative path.
+# The tree is walked with a stack of directories instead of recursion and the type of
+# each entry comes from os.scandir, so a file costs a single stat call.
+# Files and directories matching an exclude glob are skipped, and with include globs
+# only files matching one of them are listed. Files removed while the tree is scanned
+# are left out.
+def scan_tree(root, include=(), exclude=()):
+    files = []
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, rel_dir))
+        except FileNotFoundError:
+            # A missing root is still an error
+            if not rel_dir:
+                raise
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name)
+                if exclude and matches(rel_path, exclude):
+                    continue
+                if entry.is_dir():
+                    stack.append(rel_path)
+                    continue
+                if include and not matches(rel_path, include):
+                    continue
+                try:
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue
+                path = os.path.join(root, rel_path)
+                files.append(SourceFile(path, rel_path, st.st_size, st.st_mtime_ns))
+    # Sorted by path components, so a directory's files stay together
+    files.sort(key=lambda source: source.rel_path.split(os.sep))
+    return files
+
+
+# Returns (SourceFile, destination path) pairs for the pages in the content directory.
+# content/blog/tom.md is written to dest/blog/tom.html.
+def discover_pages(content_dir, dest_dir, include=(), exclude=()):
+    pages = []
+    for source in scan_tree(content_dir, include, exclude):
+        root, ext = os.path.splitext(source.rel_path)
+        if ext.lower() in PAGE_EXTENSIONS:
+            pages.append((source, os.path.join(dest_dir, root + ".html")))
+    return pages
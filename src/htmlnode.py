@@ -1,14 +1,43 @@
+import sys
+
+
+# Interns tag names so the many nodes sharing a tag share one string
+def intern_tag(tag):
+    return sys.intern(tag) if tag else tag
+
+
+# Nodes use __slots__ instead of a per-instance __dict__, as a page can have
+# thousands of them. LeafNode only stores a value and ParentNode only children.
 class HTMLNode:
+    __slots__ = ("tag", "props")
+
+    # Class defaults, shadowed by the slots of LeafNode, ParentNode and GenericNode
+    value = None
+    children = None
+
+    # A node created as HTMLNode itself is a GenericNode, which stores both
+    def __new__(cls, *args, **kwargs):
+        return super().__new__(GenericNode if cls is HTMLNode else cls)
+
     def __init__(self, tag=None, value=None, children=None, props=None):
-        self.tag = tag  # None: Render as raw text
-        self.value = value  # None: has children
-        self.children = children  # None: has value
-        self.props = props  # None: no attributes
+        self.tag = intern_tag(tag)  # None: Render as raw text
+        self.props = props or None  # None: no attributes
 
     # Will be overrided by child classes
     def to_html(self):
         raise NotImplementedError("not implemented")
 
+    # Writes the HTML of this node into writer, any object with a write method
+    # such as an open file or io.StringIO. The tree is walked with an explicit stack
+    # instead of recursion, so deeply nested trees cannot hit the recursion limit.
+    def render_to(self, writer):
+        render_to(self, writer)
+
+    # Writes this node, or its opening tag, and pushes whatever follows it onto the
+    # render stack in reverse order. Nodes without children write their whole HTML.
+    def render_step(self, write, stack):
+        write(self.to_html())
+
     def props_to_html(self):
         if self.props:
             return " ".join([f'{k}="{v}"' for k, v in self.props.items()])
@@ -16,3 +45,25 @@ class HTMLNode:
 
     def __repr__(self):
         return f"HTMLNode({self.tag}, {self.value}, {self.children}, {self.props})"
+
+
+# An HTMLNode with both a value and children
+class GenericNode(HTMLNode):
+    __slots__ = ("value", "children")
+
+    def __init__(self, tag=None, value=None, children=None, props=None):
+        super().__init__(tag, value, children, props)
+        self.value = value
+        self.children = children
+
+
+# Renders any node with a render_step method, HTML nodes as well as text nodes, into writer
+def render_to(node, writer):
+    write = writer.write
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            write(item)
+        else:
+            item.render_step(write, stack)
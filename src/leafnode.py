@@ -2,8 +2,11 @@ from htmlnode import HTMLNode
 
 
 class LeafNode(HTMLNode):
+    __slots__ = ("value",)
+
     def __init__(self, tag, value, props=None):
-        super().__init__(tag, value, None, props)
+        super().__init__(tag, None, None, props)
+        self.value = value  # None: invalid leaf
 
     def to_html(self):
         if self.value == None:
@@ -0,0 +1,42 @@
+import os
+from urllib.parse import unquote
+
+
+# Returns the URLs under which an output file can be requested:
+# blog/tom/index.html is served as /blog/tom/index.html, /blog/tom/ and /blog/tom,
+# and contact.html as /contact.html and /contact
+def output_urls(rel_path):
+    url = "/" + rel_path.replace(os.sep, "/")
+    urls = [url]
+    if url.endswith("/index.html"):
+        directory = url[: -len("index.html")]
+        urls.append(directory)
+        if directory != "/":
+            urls.append(directory[:-1])
+    elif url.endswith(".html"):
+        urls.append(url[: -len(".html")])
+    return urls
+
+
+# Returns the path part of a root-relative URL, without query string or fragment
+def link_target(url):
+    return unquote(url.split("#", 1)[0].split("?", 1)[0]) or "/"
+
+
+# Checks the links and images recorded for every page in the manifest against the
+# generated pages and synced static files. Returns the dangling ones as
+# (source path, URL) pairs.
+def find_broken_links(manifest):
+    targets = set()
+    for rel_path in manifest["pages"]:
+        targets.update(output_urls(rel_path))
+    for rel_path in manifest["assets"]:
+        # Links use the original names of fingerprinted assets
+        targets.update(output_urls(rel_path))
+
+    broken = []
+    for entry in manifest["pages"].values():
+        for url in entry.get("links", ()):
+            if link_target(url) not in targets:
+                broken.append((entry["source"], url))
+    return broken
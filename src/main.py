@@ -1,93 +1,742 @@
 #!/usr/bin/env python3
 
-import os, sys, shutil
-from markdown_formatting import markdown_to_html_node, extract_title
+import os, sys, shutil, argparse, itertools
+from io import StringIO
+from concurrent.futures import ProcessPoolExecutor
+from markdown_formatting import (
+    parse_blocks,
+    block_to_html_node,
+    extract_title,
+    MarkdownStream,
+)
+from parentnode import ParentNode
+from manifest import (
+    load_manifest,
+    save_manifest,
+    new_manifest,
+    file_fingerprint,
+    output_stat,
+    is_page_up_to_date,
+    prune_outputs,
+)
+from sync import sync_directory, load_asset_map
+from optimize import AssetOptimizer
+from compress import precompress_outputs
+from template import load_template, clear_template_cache, LayoutResolver
+from watch import watch
+from profiler import Profiler, NULL_PROFILER
+from pipeline import run_pipeline
+from staging import prepare_staging, publish
+from links import find_broken_links
+from discover import discover_pages, scan_tree
+from shards import parse_shard, in_shard, shard_dir
+from metadata import page_metadata, open_body
+from urls import UrlRewriter
+from content_cache import (
+    ContentCache,
+    CachedContent,
+    mark_url,
+    split_marked,
+    URL_MARKER,
+    DEFAULT_CACHE_SIZE,
+)
 
+# Sources larger than this (in bytes) are rendered block by block as they are read
+STREAM_THRESHOLD = 8 * 1024 * 1024
 
-# This function removes all files and subdirectories
-# from the destination path and copies the files and
-# subdirectories of the source path to the destination path.
-def clean_and_copy_directory(src, dest):
 
-    # Remove everything from the destination
-    print(f"Cleaning and copying from {src}/ to {dest}/...")
-    remove_files(dest)
-    copy_files(src, dest)
-    print("Done!")
-
-
-# Removes files recursively from the target path
+# Removes everything inside the target path, keeping the directory itself
 def remove_files(path):
-    if path_list := os.listdir(path):
-        for entry in path_list:
-            entry_path = os.path.join(path, entry)
-            # Recurse deeper if it is a directory, then remove directory
-            if os.path.isdir(entry_path):
-                remove_files(entry_path)
-                os.rmdir(entry_path)
-            # Remove the file if it is not a directory
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path)
             else:
-                os.remove(entry_path)
+                os.remove(entry.path)
+
+
+# Returns the number of nodes in a tree
+def count_nodes(node):
+    count = 0
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if node.children:
+            stack.extend(node.children)
+    return count
+
+
+# Returns the number of directories between the output root and a page
+def page_depth(dest_path, root):
+    rel_dir = os.path.relpath(os.path.dirname(dest_path), root)
+    return 0 if rel_dir == os.curdir else len(rel_dir.split(os.sep))
+
+
+# Everything needed to generate one page, also sent to worker processes.
+# Root-relative URLs of links, images and the template are rewritten for the basepath
+# as the page is built. If relative_root (the root of the output) is given, they are
+# made relative to the page instead. URLs of assets in asset_map are replaced with their
+# fingerprinted URLs. With minify, the template is minified when it is compiled.
+# With a content cache and the source hash, the rendered content is taken from the cache
+# when possible, so a template or basepath change does not parse the source again.
+# The body starts at body_offset, after the front matter, which can set the title.
+class PageJob:
+    __slots__ = (
+        "from_path",
+        "template_path",
+        "dest_path",
+        "basepath",
+        "relative_root",
+        "profile",
+        "cache",
+        "source_hash",
+        "asset_map",
+        "minify",
+        "body_offset",
+        "title",
+    )
 
+    def __init__(
+        self,
+        from_path,
+        template_path,
+        dest_path,
+        basepath,
+        relative_root=None,
+        profile=False,
+        cache=None,
+        source_hash=None,
+        asset_map=None,
+        minify=False,
+        body_offset=0,
+        title=None,
+    ):
+        self.from_path = from_path
+        self.template_path = template_path
+        self.dest_path = dest_path
+        self.basepath = basepath
+        self.relative_root = relative_root
+        self.profile = profile
+        self.cache = cache
+        self.source_hash = source_hash
+        self.asset_map = asset_map
+        self.minify = minify
+        self.body_offset = body_offset
+        self.title = title
 
-# This function copies files recursively from source destination to target destination
-def copy_files(src, dest):
-    if not os.path.exists(dest):
-        os.mkdir(dest)
+    def __repr__(self):
+        return f"PageJob({self.from_path}, {self.template_path}, {self.dest_path})"
 
-    for item in os.listdir(src):
-        src_path = os.path.join(src, item)
-        dest_path = os.path.join(dest, item)
 
-        # If the entry is a directory, copy it and copy the files/dirs inside recursively
-        if os.path.isdir(src_path):
-            if not os.path.exists(dest_path):
-                os.mkdir(dest_path)
-            copy_files(src_path, dest_path)
+# Reads what generating a page needs from disk. Returns ("cached", (title, parts)) if
+# the content cache has the page, ("markdown", text) with the body otherwise, or
+# ("stream", None) for sources that are rendered while they are read.
+def load_page(job, profiler=NULL_PROFILER):
+    if job.cache and job.source_hash:
+        with profiler.stage("cache", job.from_path):
+            cached = job.cache.get(job.source_hash)
+        if cached:
+            return "cached", cached
+    with open_body(job.from_path, job.body_offset) as source:
+        if os.fstat(source.fileno()).st_size > STREAM_THRESHOLD:
+            return "stream", None
+        with profiler.stage("read", job.from_path):
+            return "markdown", source.read()
+
+
+# Renders a page loaded by load_page.
+# Returns the HTML of the page in a StringIO, the (title, parts) to store in the content
+# cache or None, and the root-relative URLs of the page's links and images. The buffer
+# is copied into the output file as it is, so the page is not held in memory twice.
+# Streamed sources are written straight to dest_path and None is returned as their HTML.
+def render_page(job, loaded, profiler=NULL_PROFILER):
+    from_path = job.from_path
+    print(
+        f"Generating page from {from_path} to {job.dest_path} using {job.template_path}"
+    )
+    depth = page_depth(job.dest_path, job.relative_root) if job.relative_root else None
+    links = []
+    rewriter = UrlRewriter(job.basepath, depth, job.asset_map, links)
+    counters = {}
+    kind, value = loaded
+    cache_entry = None
+    with profiler.stage("page", from_path, counters):
+        template = load_template(job.template_path, rewriter, job.minify)
+        if kind == "stream":
+            source = open_body(from_path, job.body_offset)
+            with source, open_output(job.dest_path) as f:
+                lines = iter(source)
+                title = job.title
+                if title is None:
+                    # Only read up to the title, the rest is rendered while it is read
+                    title_line = next((line for line in lines if line.strip()), "")
+                    title = extract_title(title_line)
+                    lines = itertools.chain([title_line], lines)
+                content = MarkdownStream(lines, rewriter.rewrite)
+                with profiler.stage("render", from_path):
+                    template.render_to(f, {"Title": title, "Content": content})
+            return None, None, links
+
+        if kind == "cached":
+            title, parts = value
+            content = CachedContent(parts, rewriter.rewrite)
+            if profiler.enabled:
+                counters["cached"] = True
         else:
-            # for a file, just copy
-            shutil.copy(src_path, dest_path)
-
-
-def generate_page(from_path, template_path, dest_path, basepath):
-    print(f"Generating page from {from_path} to {dest_path} using {template_path}")
-    with open(from_path) as f:
-        md = f.read()
-    with open(template_path) as f:
-        html = f.read()
-    node = markdown_to_html_node(md)
-    content = node.to_html()
-    title = extract_title(md)
-    html = html.replace("{{ Title }}", title).replace("{{ Content }}", content)
-    # Replace basepath from href and src
-    html = html.replace('href="/', f'href="{basepath}').replace(
-        'src="/', f'src="{basepath}'
-    )
-    with open(dest_path, "w") as f:
-        f.write(html)
-
-
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
-    for item in os.listdir(dir_path_content):
-        item_path = os.path.join(dir_path_content, item)
-        if os.path.isdir(item_path):
-            target_path = os.path.join(dest_dir_path, item)
-            if not os.path.exists(target_path):
-                os.mkdir(target_path)
-            generate_pages_recursive(item_path, template_path, target_path, basepath)
+            md = value
+            # Content for the cache is rendered with markers around its URLs,
+            # which are rewritten when the cached content is written
+            store = job.cache and URL_MARKER not in md
+            rewrite_url = mark_url if store else rewriter.rewrite
+            with profiler.stage("blocks", from_path):
+                blocks = list(parse_blocks(md.split("\n")))
+            with profiler.stage("inline", from_path):
+                children = [
+                    block_to_html_node(block_type, lines, rewrite_url)
+                    for block_type, lines in blocks
+                ]
+                content = ParentNode("div", children)
+            title = extract_title(md) if job.title is None else None
+            if profiler.enabled:
+                counters["blocks"] = len(blocks)
+                counters["nodes"] = count_nodes(content)
+            if store:
+                parts = split_marked(content.to_html())
+                cache_entry = (title, parts)
+                content = CachedContent(parts, rewriter.rewrite)
+        # A title from the front matter takes precedence over the first heading
+        if job.title is not None:
+            title = job.title
+        with profiler.stage("render", from_path):
+            buffer = StringIO()
+            template.render_to(buffer, {"Title": title, "Content": content})
+        if profiler.enabled:
+            counters["bytes"] = buffer.tell()
+    return buffer, cache_entry, links
+
+
+# Opens an output file for writing. An existing file is removed first instead of being
+# truncated, so a file hardlinked from the previous build is never changed in place.
+def open_output(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    return open(path, "w")
+
+
+# Writes a page rendered by render_page and stores its content in the cache
+def write_page(job, html, cache_entry, profiler=NULL_PROFILER):
+    with profiler.stage("write", job.from_path):
+        if html is not None:
+            html.seek(0)
+            with open_output(job.dest_path) as f:
+                shutil.copyfileobj(html, f)
+        if cache_entry and job.source_hash:
+            job.cache.put(job.source_hash, *cache_entry)
+
+
+# Generates a page from markdown, see PageJob for the options.
+# Returns the root-relative URLs of the page's links and images.
+def generate_page(
+    from_path, template_path, dest_path, basepath, profiler=NULL_PROFILER, **options
+):
+    job = PageJob(from_path, template_path, dest_path, basepath, **options)
+    html, cache_entry, links = render_page(job, load_page(job, profiler), profiler)
+    write_page(job, html, cache_entry, profiler)
+    return links
+
+
+# Generates pages in order and returns (error, profiling events, links) for each of them.
+# A failing page is reported as an error message instead of raising, so one broken page
+# does not abort the pages generated alongside it.
+# Sources are read ahead by a reader thread and finished pages are written by a writer
+# thread, so rendering does not wait for the disk.
+# If rendered is given, the HTML of each written page is added to it by destination
+# path as a StringIO, except for streamed pages.
+def generate_page_jobs(jobs, rendered=None):
+    profilers = [Profiler() if job.profile else NULL_PROFILER for job in jobs]
+    links = [None] * len(jobs)
+
+    def read(index):
+        return load_page(jobs[index], profilers[index])
+
+    def process(index, loaded):
+        html, cache_entry, links[index] = render_page(
+            jobs[index], loaded, profilers[index]
+        )
+        return html, cache_entry
+
+    def write(index, page):
+        write_page(jobs[index], *page, profilers[index])
+        if rendered is not None and page[0] is not None:
+            rendered[jobs[index].dest_path] = page[0]
+
+    errors = run_pipeline(range(len(jobs)), read, process, write)
+    return [
+        (error, profiler.events, page_links)
+        for error, profiler, page_links in zip(errors, profilers, links)
+    ]
+
+
+# Runs page jobs in order, in worker processes if workers > 1.
+# Results are returned in the order of the jobs regardless of which worker finishes first.
+# rendered is filled as by generate_page_jobs when the pages are generated in this
+# process.
+def run_page_jobs(jobs, workers=1, rendered=None):
+    if workers <= 1 or len(jobs) <= 1:
+        return generate_page_jobs(jobs, rendered)
+    workers = min(workers, len(jobs))
+    # Send pages to the workers in chunks to keep inter-process overhead low
+    chunksize = max(1, len(jobs) // (workers * 4))
+    chunks = [jobs[i : i + chunksize] for i in range(0, len(jobs), chunksize)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [
+            result
+            for results in executor.map(generate_page_jobs, chunks)
+            for result in results
+        ]
+
+
+# Generates every page in the content directory and returns the pages that failed
+# as (source path, error) pairs.
+# If a manifest is given, pages whose source, template and basepath are unchanged
+# are skipped, and outputs of removed sources are deleted. The manifest is updated in place.
+# With jobs > 1, the pages are generated in a pool of worker processes.
+# Pages are timed with the profiler, also in worker processes.
+# With relative_urls, root-relative URLs are made relative to each page.
+# Pages use template_path unless a layout in layouts_dir applies to them.
+# Rendered content is reused from cache (a ContentCache) if one is given.
+# Asset URLs are replaced with the fingerprinted URLs of asset_map (an AssetMap).
+# With minify, pages are written without the template's indentation and comments.
+# The root-relative links and images of each page are recorded in the manifest.
+# The front matter of every source is kept in the manifest's metadata index. Pages
+# marked as drafts are only generated with drafts. A layout named in the front matter
+# (layout: blog for layouts/blog.html) takes precedence over the layouts directory.
+# A page whose layout does not exist fails like a page that cannot be rendered.
+# pages are the pages found by discover_pages, the content directory is scanned if they
+# are not given. Pages whose source exists but is not among them keep their outputs.
+# If written is given, the outputs written are added to it, mapped to their contents
+# if they were rendered in this process and to None otherwise.
+def generate_pages_recursive(
+    dir_path_content,
+    template_path,
+    dest_dir_path,
+    basepath,
+    manifest=None,
+    jobs=1,
+    layouts_dir=None,
+    profiler=NULL_PROFILER,
+    relative_urls=False,
+    cache=None,
+    asset_map=None,
+    minify=False,
+    drafts=False,
+    pages=None,
+    written=None,
+):
+    if pages is None:
+        pages = discover_pages(dir_path_content, dest_dir_path)
+    old_entries = manifest["pages"] if manifest is not None else {}
+    new_entries = {}
+    old_metadata = manifest["metadata"] if manifest is not None else {}
+    metadata = {}
+    layouts = LayoutResolver(layouts_dir, template_path) if layouts_dir else None
+
+    # Discover all pages first and collect the ones that need to be generated
+    pending = []
+    failures = []
+    missing_layouts = []
+    for source_file, dest_path in pages:
+        from_path = source_file.path
+        source_rel_path = source_file.rel_path
+        source_stat = source_file.stat()
+        page_meta = page_metadata(
+            from_path, old_metadata.get(source_rel_path), source_stat
+        )
+        metadata[source_rel_path] = page_meta
+        meta = page_meta["meta"]
+        if meta.get("draft") and not drafts:
+            continue
+
+        rel_path = os.path.relpath(dest_path, dest_dir_path)
+        previous = old_entries.get(rel_path)
+        source = file_fingerprint(
+            from_path,
+            previous and previous.get("source_stat"),
+            source_stat,
+        )
+        if meta.get("layout"):
+            layout = os.path.join(layouts_dir or "layouts", meta["layout"] + ".html")
+        elif layouts:
+            layout = layouts.resolve(source_rel_path)
         else:
-            target_name = ".".join(item.split(".")[:-1]) + ".html"
-            target_path = os.path.join(dest_dir_path, target_name)
-            generate_page(item_path, template_path, target_path, basepath)
+            layout = template_path
+        try:
+            template_hash = load_template(layout).hash
+        except FileNotFoundError:
+            # Reported like a render error, so the other pages are still generated
+            failures.append((from_path, f"Layout {layout} does not exist"))
+            missing_layouts.append(rel_path)
+            continue
+        entry = {
+            "source": source_rel_path,
+            "source_stat": source,
+            "source_hash": source["hash"],
+            "template": layout,
+            "template_hash": template_hash,
+            "basepath": basepath,
+            "relative_urls": relative_urls,
+            "assets": asset_map.digest if asset_map else None,
+            "minify": minify,
+        }
+        new_entries[rel_path] = entry
+        if manifest is not None and is_page_up_to_date(previous, entry, dest_path):
+            entry["output"] = previous["output"]
+            entry["links"] = previous.get("links", [])
+        else:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            relative_root = dest_dir_path if relative_urls else None
+            job = PageJob(
+                from_path,
+                layout,
+                dest_path,
+                basepath,
+                relative_root=relative_root,
+                profile=profiler.enabled,
+                cache=cache,
+                source_hash=source["hash"],
+                asset_map=asset_map,
+                minify=minify,
+                body_offset=page_meta["offset"],
+                title=meta.get("title"),
+            )
+            pending.append((rel_path, job))
+
+    rendered = {} if written is not None else None
+    results = run_page_jobs([job for _, job in pending], jobs, rendered)
+    for (rel_path, job), (error, events, links) in zip(pending, results):
+        profiler.merge(events)
+        if error:
+            # Leave the failed page out of the manifest so it is retried next time
+            del new_entries[rel_path]
+            failures.append((job.from_path, error))
+        else:
+            new_entries[rel_path]["output"] = output_stat(job.dest_path)
+            new_entries[rel_path]["links"] = sorted(set(links))
+            if written is not None:
+                html = rendered.get(job.dest_path)
+                written[rel_path] = (
+                    html.getvalue().encode() if html is not None else None
+                )
 
+    for from_path, error in failures:
+        print(f"Failed to generate page from {from_path}:\n{error}", file=sys.stderr)
 
-def main():
-    basepath = "/"
-    if len(sys.argv) > 1:
-        basepath = sys.argv[1]
+    if manifest is not None:
+        # Pages left out of this build, for example by --include, are kept as they were
+        scanned = {source_file.rel_path for source_file, _ in pages}
+        for rel_path, entry in old_entries.items():
+            source = entry["source"]
+            if (
+                rel_path not in new_entries
+                and source not in scanned
+                and os.path.exists(os.path.join(dir_path_content, source))
+            ):
+                new_entries[rel_path] = entry
+        for source, page_meta in old_metadata.items():
+            if source not in scanned and os.path.exists(
+                os.path.join(dir_path_content, source)
+            ):
+                metadata[source] = page_meta
+        # Outputs of failed pages are kept, only pages whose source is gone are removed
+        kept = {**new_entries, **{rel_path: None for rel_path, _ in pending}}
+        kept.update(dict.fromkeys(missing_layouts))
+        for rel_path in prune_outputs(old_entries, kept, dest_dir_path):
+            print(f"Removed {rel_path}, its source no longer exists")
+        manifest["pages"] = new_entries
+        manifest["metadata"] = metadata
+    return failures
 
-    clean_and_copy_directory("static", "docs")
-    generate_pages_recursive("content", "template.html", "docs", basepath)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a static site from markdown")
+    parser.add_argument("basepath", nargs="?", default="/")
+    parser.add_argument(
+        "--clean",
+        action="store_true",
+        help="remove the previous output and rebuild every page",
+    )
+    parser.add_argument(
+        "--checksum-assets",
+        action="store_true",
+        help="compare static files by content hash instead of size and mtime",
+    )
+    parser.add_argument(
+        "--link-assets",
+        action="store_true",
+        help="hardlink static files into the output instead of copying them",
+    )
+    parser.add_argument(
+        "--optimize-assets",
+        action="store_true",
+        help="recompress PNG images and minify CSS files in static/",
+    )
+    parser.add_argument(
+        "--fingerprint-assets",
+        action="store_true",
+        help="name static files after a hash of their contents and rewrite references",
+    )
+    parser.add_argument(
+        "--minify",
+        action="store_true",
+        help="leave the template's indentation and comments out of generated pages",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="write gzip-compressed copies (.gz) of HTML, CSS and other text outputs",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of processes used to generate pages (0: one per CPU)",
+    )
+    parser.add_argument(
+        "--layouts",
+        default="layouts",
+        help="directory of per-directory and per-page layouts (default: layouts)",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="only build content files matching the glob (repeatable)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="skip content files or directories matching the glob (repeatable)",
+    )
+    parser.add_argument(
+        "--include-static",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="only sync static files matching the glob (repeatable)",
+    )
+    parser.add_argument(
+        "--exclude-static",
+        action="append",
+        default=[],
+        metavar="GLOB",
+        help="skip static files or directories matching the glob (repeatable)",
+    )
+    parser.add_argument(
+        "--relative-urls",
+        action="store_true",
+        help="write root-relative URLs relative to each page instead of the basepath",
+    )
+    parser.add_argument(
+        "--drafts",
+        action="store_true",
+        help="also generate pages marked as drafts in their front matter",
+    )
+    parser.add_argument(
+        "--atomic",
+        action="store_true",
+        help="build into a staging directory and switch docs/ to it atomically",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="I/N",
+        help="build only the I-th of N shards of the site into docs.shards/I-of-N/, "
+        "to be combined with src/shards.py",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="serve the site, rebuild on changes and reload open pages",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="serve the site from memory and rebuild on changes, without live reload",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8888,
+        help="port of the --watch and --serve server (default: 8888)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="time every build stage and page and write a Chrome trace",
+    )
+    parser.add_argument(
+        "--profile-output",
+        default="profile-trace.json",
+        help="trace file written by --profile (default: profile-trace.json)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".ssg-cache",
+        help="directory of the parsed content cache (default: .ssg-cache)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE // (1024 * 1024),
+        help="size limit of the content cache in MiB (default: 256)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="parse every regenerated page instead of using the content cache",
+    )
+    args = parser.parse_args(argv)
+    if args.shard and (args.atomic or args.watch or args.serve):
+        parser.error("--shard cannot be combined with --atomic, --watch or --serve")
+    return args
+
+
+# Runs one build and returns the pages that failed to generate.
+# If written is given, the outputs the build wrote are added to it, see
+# generate_pages_recursive.
+def build(args, written=None):
+    profiler = Profiler() if args.profile else NULL_PROFILER
+    # Templates may have been edited since the previous build in this process
+    clear_template_cache()
+
+    if args.atomic:
+        # Unchanged outputs are hardlinked from the live build, so the build below
+        # only writes what changed
+        dest = prepare_staging("docs", args.clean)
+        manifest = new_manifest() if args.clean else load_manifest(dest)
+    elif args.clean:
+        dest = shard_dir("docs", args.shard) if args.shard else "docs"
+        print(f"Cleaning {dest}/...")
+        if os.path.isdir(dest):
+            remove_files(dest)
+        manifest = new_manifest()
+    else:
+        dest = shard_dir("docs", args.shard) if args.shard else "docs"
+        manifest = load_manifest(dest)
+    if args.shard:
+        # Recorded for the merge, which checks that it gets each shard exactly once
+        index, count = args.shard
+        manifest["shard"] = {"index": index, "count": count}
+
+    with profiler.stage("discover"):
+        # Both trees are scanned once, with one stat call per file, and the stat data
+        # is reused by the asset sync and the page generation
+        pages = discover_pages("content", dest, args.include, args.exclude)
+        static_files = scan_tree("static", args.include_static, args.exclude_static)
+        # Pages take precedence over static files with the same output path, also the
+        # pages left out by --include or --exclude, whose outputs are kept
+        all_pages = pages
+        if args.include or args.exclude:
+            all_pages = discover_pages("content", dest)
+        page_outputs = {os.path.relpath(dest_path, dest) for _, dest_path in all_pages}
+        if args.shard:
+            pages = [page for page in pages if in_shard(page[0].rel_path, args.shard)]
+            # Every page needs the fingerprinted name of every asset, so fingerprinted
+            # assets are synced by all shards, the merge takes them from the first
+            if not args.fingerprint_assets:
+                static_files = [
+                    source
+                    for source in static_files
+                    if in_shard(source.rel_path, args.shard)
+                ]
+    jobs = args.jobs or os.cpu_count() or 1
+    cache_dir = None if args.no_cache else args.cache_dir
+    optimizer = AssetOptimizer(cache_dir, jobs) if args.optimize_assets else None
+    with profiler.stage("static"):
+        sync_directory(
+            "static",
+            dest,
+            manifest,
+            checksum=args.checksum_assets,
+            hardlink=args.link_assets,
+            exclude=page_outputs,
+            optimizer=optimizer,
+            fingerprint=args.fingerprint_assets,
+            files=static_files,
+            written=written,
+        )
+    assets = load_asset_map(manifest) if args.fingerprint_assets else None
+    cache = None
+    if cache_dir:
+        cache = ContentCache(cache_dir, args.cache_size * 1024 * 1024)
+    with profiler.stage("pages"):
+        failures = generate_pages_recursive(
+            "content",
+            "template.html",
+            dest,
+            args.basepath,
+            manifest=manifest,
+            jobs=jobs,
+            layouts_dir=args.layouts,
+            profiler=profiler,
+            relative_urls=args.relative_urls,
+            cache=cache,
+            asset_map=assets,
+            minify=args.minify,
+            drafts=args.drafts,
+            pages=pages,
+            written=written,
+        )
+    # Compressed copies of earlier builds are removed when --gzip is left out
+    if args.gzip or manifest["compressed"]:
+        outputs = list(manifest["pages"])
+        for rel_path, entry in manifest["assets"].items():
+            outputs.append(entry.get("path", rel_path))
+        with profiler.stage("compress"):
+            precompress_outputs(dest, manifest, outputs if args.gzip else [], jobs)
+    save_manifest(dest, manifest)
+    # Links are checked against the manifest, also those of pages that were not rebuilt.
+    # A shard only has some of the pages, its links are checked after the merge.
+    broken_links = [] if args.shard else find_broken_links(manifest)
+    for source, url in broken_links:
+        print(f"Broken link in content/{source}: {url}", file=sys.stderr)
+    if broken_links:
+        print(f"{len(broken_links)} broken link(s)", file=sys.stderr)
+    if args.atomic:
+        publish("docs", dest)
+        print(f"Published {dest}")
+    if cache:
+        cache.evict()
+
+    if profiler.enabled:
+        profiler.report()
+        profiler.write_trace(args.profile_output)
+        print(f"Wrote trace to {args.profile_output}")
+    return failures
+
+
+def main():
+    args = parse_args()
+    failures = build(args)
+    if args.watch or args.serve:
+        # Only the first build cleans the output
+        args.clean = False
+        watch(
+            ["content", "static", "template.html", args.layouts],
+            lambda written: build(args, written),
+            "docs",
+            args.port,
+            live_reload=args.watch,
+        )
+    elif failures:
+        sys.exit(f"{len(failures)} page(s) failed to generate")
 
 
 if __name__ == "__main__":
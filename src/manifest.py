@@ -0,0 +1,132 @@
+import os, json, hashlib
+
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 1
+# Entries of a page that must be unchanged for its output to be reused
+PAGE_SETTINGS = (
+    "source_hash",
+    "template_hash",
+    "basepath",
+    "relative_urls",
+    "assets",
+    "minify",
+)
+
+
+# Returns an empty manifest
+def new_manifest():
+    return {
+        "version": MANIFEST_VERSION,
+        "pages": {},
+        "assets": {},
+        "compressed": {},
+        "metadata": {},
+    }
+
+
+# Loads the build manifest from the output directory.
+# A missing, unreadable or outdated manifest is treated as an empty one,
+# which makes the next build a full build.
+def load_manifest(dest_dir):
+    try:
+        with open(os.path.join(dest_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return new_manifest()
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return new_manifest()
+    manifest.setdefault("pages", {})
+    manifest.setdefault("assets", {})
+    manifest.setdefault("compressed", {})
+    manifest.setdefault("metadata", {})
+    return manifest
+
+
+# Writes bytes to a temporary file and renames it over the path, so readers never
+# see a partial file
+def write_file(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+# Writes the manifest atomically so an interrupted build never leaves a half-written file
+def save_manifest(dest_dir, manifest):
+    os.makedirs(dest_dir, exist_ok=True)
+    text = json.dumps(manifest, indent=1, sort_keys=True)
+    write_file(os.path.join(dest_dir, MANIFEST_NAME), text.encode())
+
+
+# Returns the sha256 hex digest of a file's contents
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Returns the fingerprint (size, mtime and content hash) of a file.
+# If the size and mtime match the previous fingerprint, its hash is reused
+# so unchanged files are never read. The stat data can be passed in if it is known.
+def file_fingerprint(path, previous=None, stat=None):
+    if stat is None:
+        st = os.stat(path)
+        stat = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    # Entries written without a hash, such as assets synced without checksums, are
+    # hashed again
+    if (
+        previous
+        and "hash" in previous
+        and previous.get("size") == stat["size"]
+        and previous.get("mtime_ns") == stat["mtime_ns"]
+    ):
+        return previous
+    return {**stat, "hash": hash_file(path)}
+
+
+# Returns the size and mtime of a generated file, or None if it does not exist
+def output_stat(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+# Checks whether a page recorded in the manifest can be reused as is.
+# The source, template and output settings (PAGE_SETTINGS) must be unchanged and the
+# output must not have been modified or removed since it was written.
+def is_page_up_to_date(previous, entry, dest_path):
+    if not previous:
+        return False
+    for key in PAGE_SETTINGS:
+        if previous.get(key) != entry.get(key):
+            return False
+    return previous.get("output") == output_stat(dest_path)
+
+
+# Removes outputs that were recorded in the previous manifest but are no longer generated,
+# along with any directories left empty by the removal
+def prune_outputs(old_entries, new_entries, dest_dir):
+    removed = []
+    for rel_path in sorted(set(old_entries) - set(new_entries)):
+        path = os.path.join(dest_dir, rel_path)
+        if os.path.isfile(path):
+            os.remove(path)
+            removed.append(rel_path)
+        remove_empty_dirs(os.path.dirname(path), dest_dir)
+    return removed
+
+
+# Removes empty directories from path upwards, stopping at the root directory
+def remove_empty_dirs(path, root):
+    root = os.path.abspath(root)
+    path = os.path.abspath(path)
+    while path != root and path.startswith(root + os.sep):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
@@ -1,9 +1,7 @@
 import re
 from enum import Enum
-from htmlnode import HTMLNode
 from parentnode import ParentNode
-from leafnode import LeafNode
-from textnode import TextNode, TextType, text_node_to_html_node, text_to_textnodes
+from textnode import TextNode, TextType, text_to_textnodes
 
 
 # Markdown block types
@@ -16,14 +14,23 @@ class BlockType(Enum):
     ORDERED_LIST = "ordered_list"
 
 
+# Precompiled patterns used by the block parser and the helpers below
+IMAGE_PATTERN = re.compile(r"!\[(.*?)\]\((.*?)\)")
+LINK_PATTERN = re.compile(r"(?<!!)\[(.*?)\]\((.*?)\)")
+HEADING_PATTERN = re.compile(r"#{1,6} ")
+QUOTE_PATTERN = re.compile(r">($|\s)")
+ORDERED_ITEM_PATTERN = re.compile(r"(\d+)\. ")
+FENCE = "```"
+
+
 # This function uses a regexpr to find images in markdown text
 def extract_markdown_images(text):
-    return re.findall(r"!\[(.*?)\]\((.*?)\)", text)
+    return IMAGE_PATTERN.findall(text)
 
 
 # This function uses a regexpr to find links in markdown text
 def extract_markdown_links(text):
-    return re.findall(r"(?<!!)\[(.*?)\]\((.*?)\)", text)
+    return LINK_PATTERN.findall(text)
 
 
 # This function takes a raw markdown string and returns the document in a list of blocks.
@@ -61,82 +68,136 @@ def is_ordered_list(block):
     return True and len(lines) > 0
 
 
-# This function converts raw markdown text to a HTMLNode object
-def markdown_to_html_node(markdown):
-    blocks = markdown_to_blocks(markdown)
-
-    all_children = []
-    for block in blocks:
-        block_type = block_to_block_type(block)
-
-        # Handle special case, code blocks
-        if block_type == BlockType.CODE:
-            raw_text_node = TextNode(
-                ("\n".join(block.split("\n")[1:-1]) + "\n"), TextType.CODE
-            )
-            code_node = text_node_to_html_node(raw_text_node)
-            block_parent = ParentNode("pre", [code_node])
-
-        # Handle other block types
+# This function parses markdown lines into (BlockType, lines) blocks in a single forward scan.
+# Lines can come from any iterable, such as an open file, and blocks are yielded as soon as
+# they are complete. Each line is classified by its first character. Headings, code fences,
+# quotes and list items start a new block even without a blank line before them, and any
+# number of blank lines can separate blocks.
+# The lines of a block are stripped, except in code blocks where only the indentation of
+# the opening fence is removed. Quote and list lines have their markers removed, and
+# list blocks have one line per item, with lines that do not start a new item joined
+# to the previous item.
+def parse_blocks(lines):
+    block_type = None
+    block_lines = []
+    next_number = 0  # Number of the next item in an ordered list
+    fence_indent = None  # Indentation of the open code fence, None outside code blocks
+
+    for raw_line in lines:
+        if fence_indent is not None:
+            code_line = raw_line.rstrip()
+            if code_line.strip() == FENCE:
+                yield BlockType.CODE, block_lines
+                block_type, block_lines, fence_indent = None, [], None
+            elif not code_line[:fence_indent].strip():
+                block_lines.append(code_line[fence_indent:])
+            else:
+                block_lines.append(code_line.lstrip())
+            continue
+
+        line = raw_line.strip()
+        if not line:
+            if block_type:
+                yield block_type, block_lines
+                block_type, block_lines = None, []
+            continue
+
+        first = line[0]
+        if first == "#" and HEADING_PATTERN.match(line):
+            line_type = BlockType.HEADING
+        elif first == "`" and line.startswith(FENCE):
+            line_type = BlockType.CODE
+        elif first == ">" and QUOTE_PATTERN.match(line):
+            line_type = BlockType.QUOTE
+            line = line[1:].lstrip()
+        elif first == "-" and line.startswith("- "):
+            line_type = BlockType.UNORDERED_LIST
+            line = line[2:]
+        elif first.isdigit() and (match := ORDERED_ITEM_PATTERN.match(line)):
+            # Only a correctly numbered item continues a list, and only 1. starts one
+            number = int(match.group(1))
+            if number == (next_number if block_type == BlockType.ORDERED_LIST else 1):
+                line_type = BlockType.ORDERED_LIST
+                line = line[match.end() :]
+                next_number = number + 1
+            else:
+                line_type = BlockType.PARAGRAPH
         else:
-            # Get the parent and child tags
-            html_tag = block_type_to_html_tag(block, block_type)
-            block_rows = block.split("\n")
-
-            block_parent = block_rows_to_parents(block_rows, html_tag[1], html_tag[0])
-        all_children.append(block_parent)
+            line_type = BlockType.PARAGRAPH
+
+        # Plain lines continue the paragraph, quote or list item they follow
+        if line_type == BlockType.PARAGRAPH and block_type:
+            if block_type in (BlockType.UNORDERED_LIST, BlockType.ORDERED_LIST):
+                block_lines[-1] += " " + line
+            else:
+                block_lines.append(line)
+            continue
+        if line_type == block_type and line_type != BlockType.HEADING:
+            block_lines.append(line)
+            continue
+
+        if block_type:
+            yield block_type, block_lines
+        if line_type == BlockType.HEADING:
+            yield line_type, [line]
+            block_type, block_lines = None, []
+        elif line_type == BlockType.CODE:
+            fence_indent = len(raw_line) - len(raw_line.lstrip())
+            block_type, block_lines = line_type, []
+        else:
+            block_type, block_lines = line_type, [line]
 
-    parent = ParentNode("div", all_children)
-    return parent
+    # An unclosed code fence runs to the end of the document
+    if block_type:
+        yield block_type, block_lines
 
 
-# Returns parent tag and child tag if applicable
-def block_type_to_html_tag(block, block_type):
+# This function converts a block from parse_blocks to a HTMLNode object.
+# The URLs of links and images are passed through rewrite_url if it is given.
+def block_to_html_node(block_type, lines, rewrite_url=None):
     match block_type:
-        case BlockType.PARAGRAPH:
-            return ("p", None)
+        case BlockType.CODE:
+            return ParentNode("pre", [TextNode("\n".join(lines) + "\n", TextType.CODE)])
         case BlockType.HEADING:
-            num = len(block.split(" ")[0])
-            return (f"h{num}", None)
+            marker, text = lines[0].split(" ", 1)
+            return ParentNode(f"h{len(marker)}", text_to_textnodes(text, rewrite_url))
+        case BlockType.PARAGRAPH:
+            return ParentNode("p", text_to_textnodes(" ".join(lines), rewrite_url))
         case BlockType.QUOTE:
-            return ("blockquote", None)
-        case BlockType.UNORDERED_LIST:
-            return ("ul", "li")
-        case BlockType.ORDERED_LIST:
-            return ("ol", "li")
+            text = " ".join(line for line in lines if line)
+            return ParentNode("blockquote", text_to_textnodes(text, rewrite_url))
+        case BlockType.UNORDERED_LIST | BlockType.ORDERED_LIST:
+            tag = "ul" if block_type == BlockType.UNORDERED_LIST else "ol"
+            items = [
+                ParentNode("li", text_to_textnodes(line, rewrite_url)) for line in lines
+            ]
+            return ParentNode(tag, items)
         case _:
             raise ValueError(f"{block_type} not a valid type")
 
 
-def block_rows_to_parents(block_rows, child_tag, parent_tag):
-    block_children = []
-    is_paragraph = True if parent_tag == "p" else False
-    if is_paragraph:
-        block_rows = [" ".join(block_rows)]
-    if parent_tag == "blockquote":
-        block_rows = ["> " + "".join(block_rows).replace(">", "").strip()]
-    for row in block_rows:
-        row_children = text_to_children(row, is_paragraph)
-
-        # If there is no child tag, don't create a nested ParentNode
-        if not child_tag:
-            block_children.extend(row_children)
-
-        else:
-            block_children.append(ParentNode(child_tag, row_children))
-    return ParentNode(parent_tag, block_children)
-
-
-# This function parses a row of raw text, strips the characters at the beginning of string, and returns the text nodes parsed from the text
-def text_to_children(text, is_paragraph):
-    children = []
-    if not is_paragraph:
-        # Remove the identifier from the row
-        text = " ".join(text.split(" ")[1:])
-    text_nodes = text_to_textnodes(text)
-    for node in text_nodes:
-        children.append(text_node_to_html_node(node))
-    return children
+# This function converts raw markdown text to a HTMLNode object
+def markdown_to_html_node(markdown, rewrite_url=None):
+    children = [
+        block_to_html_node(block_type, lines, rewrite_url)
+        for block_type, lines in parse_blocks(markdown.split("\n"))
+    ]
+    return ParentNode("div", children)
+
+
+# Markdown that is rendered block by block while its lines are read.
+# Only the lines of the current block are kept in memory, so the memory use
+# does not depend on the size of the document.
+class MarkdownStream:
+    def __init__(self, lines, rewrite_url=None):
+        self.lines = lines
+        self.rewrite_url = rewrite_url
+
+    def render_to(self, writer):
+        writer.write("<div>")
+        for block_type, lines in parse_blocks(self.lines):
+            block_to_html_node(block_type, lines, self.rewrite_url).render_to(writer)
+        writer.write("</div>")
 
 
 # Extracts the h1 header text
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+import os, io, sys, json, argparse
+from manifest import load_manifest
+from discover import scan_tree, PAGE_EXTENSIONS
+
+FRONT_MATTER_FENCE = "---"
+# Front matter that is not closed within this many lines is treated as page content
+MAX_FRONT_MATTER_LINES = 100
+FALSE_VALUES = ("", "false", "no", "0")
+
+
+# Parses front matter lines of the form "key: value". Tags are a comma separated list,
+# optionally in brackets, and draft is a boolean. Other values are kept as strings.
+def parse_front_matter(lines):
+    meta = {}
+    for line in lines:
+        key, sep, value = line.partition(":")
+        if not sep or not key.strip():
+            continue
+        key = key.strip().lower()
+        value = value.strip()
+        if key == "tags":
+            value = [tag.strip() for tag in value.strip("[]").split(",") if tag.strip()]
+        elif key == "draft":
+            value = value.lower() not in FALSE_VALUES
+        else:
+            value = value.strip("\"'")
+        meta[key] = value
+    return meta
+
+
+# Reads the front matter at the top of a markdown file, without reading the body:
+# ---
+# title: Why Tom Bombadil Was a Mistake
+# date: 2024-01-05
+# tags: tolkien, lotr
+# ---
+# Returns the metadata and the byte offset of the body.
+def read_front_matter(path):
+    with open(path, "rb") as f:
+        if f.readline().decode().strip() != FRONT_MATTER_FENCE:
+            return {}, 0
+        lines = []
+        for _ in range(MAX_FRONT_MATTER_LINES):
+            line = f.readline()
+            if not line:
+                break
+            line = line.decode().strip()
+            if line == FRONT_MATTER_FENCE:
+                return parse_front_matter(lines), f.tell()
+            lines.append(line)
+    return {}, 0
+
+
+# Opens the body of a markdown file as text, skipping the front matter
+def open_body(path, offset=0):
+    raw = open(path, "rb")
+    raw.seek(offset)
+    return io.TextIOWrapper(raw)
+
+
+# Returns the metadata index entry of a source: its size and mtime, the byte offset of
+# its body and its front matter. If the size and mtime match the previous entry, it is
+# reused and the file is not opened. The stat data can be passed in if it is known.
+def page_metadata(path, previous=None, stat=None):
+    if stat is None:
+        st = os.stat(path)
+        stat = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if previous and previous.get("stat") == stat:
+        return previous
+    meta, offset = read_front_matter(path)
+    return {"stat": stat, "offset": offset, "meta": meta}
+
+
+# Brings a metadata index ({source path relative to the content directory: entry})
+# up to date with the markdown files of the content directory. Only new or changed
+# files are read. Returns the updated index.
+def update_index(content_dir, index):
+    new_index = {}
+    for source in scan_tree(content_dir):
+        if os.path.splitext(source.rel_path)[1].lower() in PAGE_EXTENSIONS:
+            previous = index.get(source.rel_path)
+            new_index[source.rel_path] = page_metadata(
+                source.path, previous, source.stat()
+            )
+    return new_index
+
+
+# Returns the (source path, metadata) pairs of the index that match the query, by date
+def query_index(index, drafts=None, tag=None, since=None, until=None):
+    results = []
+    for rel_path, entry in index.items():
+        meta = entry["meta"]
+        if drafts is not None and meta.get("draft", False) != drafts:
+            continue
+        if tag and tag not in meta.get("tags", ()):
+            continue
+        # ISO dates (2024-01-05) compare correctly as strings
+        date = meta.get("date", "")
+        if since and not date >= since:
+            continue
+        if until and not (date and date <= until):
+            continue
+        results.append((rel_path, meta))
+    return sorted(results, key=lambda result: (result[1].get("date", ""), result[0]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the page metadata index")
+    parser.add_argument("--content", default="content")
+    parser.add_argument("--output", default="docs", help="directory of the manifest")
+    drafts = parser.add_mutually_exclusive_group()
+    drafts.add_argument("--drafts", action="store_true", help="only drafts")
+    drafts.add_argument("--published", action="store_true", help="only non-drafts")
+    parser.add_argument("--tag")
+    parser.add_argument("--since", help="date (YYYY-MM-DD) on or after")
+    parser.add_argument("--until", help="date (YYYY-MM-DD) on or before")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    # The index saved by the last build is refreshed with the sources changed since
+    index = update_index(args.content, load_manifest(args.output)["metadata"])
+    drafts = True if args.drafts else False if args.published else None
+    results = query_index(index, drafts, args.tag, args.since, args.until)
+    if args.json:
+        json.dump(dict(results), sys.stdout, indent=1)
+        print()
+        return
+    for rel_path, meta in results:
+        tags = ", ".join(meta.get("tags", ()))
+        draft = " (draft)" if meta.get("draft") else ""
+        print(f"{meta.get('date', ''):10}  {rel_path}  {meta.get('title', '')}{draft}")
+        if tags:
+            print(f"{'':10}  tags: {tags}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os, re, zlib, struct, hashlib
+from concurrent.futures import ProcessPoolExecutor
+from manifest import write_file
+from sync import copy_file
+
+# Bump when an optimizer changes its output, so cached results are not reused
+OPTIMIZER_VERSION = 1
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Chunks kept in optimized PNGs: the image data and the chunks that change how it is
+# displayed. Text, timestamps, EXIF data, physical dimensions and private chunks
+# (such as Apple's iDOT, which points into the original IDAT chunks) are dropped.
+PNG_KEEP_CHUNKS = {
+    b"IHDR",
+    b"PLTE",
+    b"tRNS",
+    b"gAMA",
+    b"cHRM",
+    b"sRGB",
+    b"iCCP",
+    b"IDAT",
+    b"IEND",
+}
+# Chunks of animated PNGs, whose frames are left alone
+PNG_ANIMATION_CHUNKS = {b"acTL", b"fcTL", b"fdAT"}
+PNG_IDAT_SIZE = 256 * 1024
+
+# Matches the strings of a stylesheet, which are copied as they are, and its comments
+CSS_TOKEN = re.compile(r"(\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*')|/\*.*?\*/", re.S)
+CSS_WHITESPACE = re.compile(r"\s+")
+# Punctuation around which whitespace is never needed
+CSS_PUNCTUATION = re.compile(r" ?([{};,>]) ?")
+
+
+# Returns the (type, data) chunks of a PNG file.
+# Raises ValueError if the data is not a valid PNG.
+def read_png_chunks(data):
+    if not data.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    chunks = []
+    i = len(PNG_SIGNATURE)
+    while i < len(data):
+        if i + 8 > len(data):
+            raise ValueError("truncated PNG chunk")
+        length, chunk_type = struct.unpack(">I4s", data[i : i + 8])
+        chunk_data = data[i + 8 : i + 8 + length]
+        crc = data[i + 8 + length : i + 12 + length]
+        if len(chunk_data) != length or len(crc) != 4:
+            raise ValueError("truncated PNG chunk")
+        if struct.unpack(">I", crc)[0] != zlib.crc32(chunk_type + chunk_data):
+            raise ValueError(f"bad CRC in PNG chunk {chunk_type}")
+        chunks.append((chunk_type, chunk_data))
+        i += 12 + length
+        if chunk_type == b"IEND":
+            break
+    return chunks
+
+
+def png_chunk(chunk_type, data):
+    crc = zlib.crc32(chunk_type + data)
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", crc)
+
+
+# Losslessly recompresses a PNG: the image data is deflated again at the highest
+# zlib level and ancillary chunks that do not affect display are dropped.
+# The pixels are not decoded, so the filters chosen by the encoder are kept.
+# Returns the original data if the result is not smaller or the PNG is not supported.
+def optimize_png(data):
+    try:
+        chunks = read_png_chunks(data)
+        if any(chunk_type in PNG_ANIMATION_CHUNKS for chunk_type, _ in chunks):
+            return data
+        image = zlib.decompress(
+            b"".join(data for chunk_type, data in chunks if chunk_type == b"IDAT")
+        )
+    except (ValueError, zlib.error):
+        return data
+
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 15, 9)
+    compressed = compressor.compress(image) + compressor.flush()
+    out = [PNG_SIGNATURE]
+    for chunk_type, chunk_data in chunks:
+        if chunk_type == b"IDAT":
+            # All image data goes where the first IDAT chunk was
+            for i in range(0, len(compressed), PNG_IDAT_SIZE):
+                out.append(png_chunk(b"IDAT", compressed[i : i + PNG_IDAT_SIZE]))
+            compressed = b""
+        elif chunk_type in PNG_KEEP_CHUNKS:
+            out.append(png_chunk(chunk_type, chunk_data))
+    optimized = b"".join(out)
+    return optimized if len(optimized) < len(data) else data
+
+
+# Minifies a stylesheet: comments are removed and whitespace is collapsed,
+# except inside strings
+def minify_css(text):
+    parts = []
+    code = []
+    start_idx = 0
+    for match in CSS_TOKEN.finditer(text):
+        code.append(text[start_idx : match.start()])
+        string = match.group(1)
+        if string:
+            parts.append(minify_css_code("".join(code)))
+            parts.append(string)
+            code = []
+        else:
+            # A comment separates the tokens around it like whitespace
+            code.append(" ")
+        start_idx = match.end()
+    code.append(text[start_idx:])
+    parts.append(minify_css_code("".join(code)))
+    return "".join(parts).strip()
+
+
+# Minifies a stretch of CSS that contains no strings or comments
+def minify_css_code(code):
+    code = CSS_WHITESPACE.sub(" ", code)
+    code = CSS_PUNCTUATION.sub(r"\1", code).replace(": ", ":")
+    return code.replace(";}", "}")
+
+
+# Minifies a stylesheet given as bytes. Stylesheets that are not UTF-8 are left alone.
+def minify_css_file(data):
+    try:
+        return minify_css(data.decode()).encode()
+    except UnicodeDecodeError:
+        return data
+
+
+# Optimizers by file extension, each taking and returning the contents of a file
+OPTIMIZERS = {".png": optimize_png, ".css": minify_css_file}
+
+
+# Writes the optimized version of an asset and returns (original size, optimized size).
+# If cache_dir is given, the result is stored there by the hash of the input, and an
+# input that was optimized before is copied from the cache instead.
+def optimize_asset(job):
+    src_path, dest_path, cache_dir = job
+    ext = os.path.splitext(src_path)[1].lower()
+    with open(src_path, "rb") as f:
+        data = f.read()
+    if not cache_dir:
+        optimized = OPTIMIZERS[ext](data)
+        write_file(dest_path, optimized)
+        return len(data), len(optimized)
+
+    key = hashlib.sha256(f"{OPTIMIZER_VERSION}:".encode() + data).hexdigest()
+    cached_path = os.path.join(cache_dir, "assets", key[:2], key + ext)
+    try:
+        # Marks the entry as recently used for the cache eviction
+        os.utime(cached_path)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        write_file(cached_path, OPTIMIZERS[ext](data))
+    copy_file(cached_path, dest_path)
+    return len(data), os.path.getsize(dest_path)
+
+
+# Optimizes assets during the static sync, in a pool of worker processes if workers > 1
+class AssetOptimizer:
+    def __init__(self, cache_dir=None, workers=1):
+        self.cache_dir = cache_dir
+        self.workers = workers
+
+    def accepts(self, rel_path):
+        return os.path.splitext(rel_path)[1].lower() in OPTIMIZERS
+
+    # Optimizes (source, destination) pairs and returns their (original size,
+    # optimized size) in the same order
+    def run(self, files):
+        jobs = [(src_path, dest_path, self.cache_dir) for src_path, dest_path in files]
+        if self.workers <= 1 or len(jobs) <= 1:
+            return [optimize_asset(job) for job in jobs]
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+            return list(executor.map(optimize_asset, jobs))
+
+    def __repr__(self):
+        return f"AssetOptimizer({self.cache_dir}, {self.workers})"
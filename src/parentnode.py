@@ -1,11 +1,20 @@
+from io import StringIO
 from htmlnode import HTMLNode
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ("children",)
+
     def __init__(self, tag, children, props=None):
-        super().__init__(tag, None, children, props)
+        super().__init__(tag, None, None, props)
+        self.children = children
 
     def to_html(self):
+        buffer = StringIO()
+        self.render_to(buffer)
+        return buffer.getvalue()
+
+    def render_step(self, write, stack):
         if self.tag == None:
             raise ValueError("ParentNode missing tag")
         if not self.children:
@@ -13,12 +22,10 @@ class ParentNode(HTMLNode):
 
         props_html = HTMLNode.props_to_html(self)
         props_str = f" {props_html}" if props_html else ""
-        res_str = f"<{self.tag}{props_str}>"
-        # Add child(ren) to result HTML string
-        for child in self.children:
-            res_str += f"{child.to_html()}"
-        res_str += f"</{self.tag}>"
-        return res_str
+        write(f"<{self.tag}{props_str}>")
+        # The closing tag is written after all the children
+        stack.append(f"</{self.tag}>")
+        stack.extend(reversed(self.children))
 
     def __repr__(self):
         return f"ParentNode({self.tag}, {self.value}, {self.children}, {self.props})"
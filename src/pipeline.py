@@ -0,0 +1,58 @@
+import queue, threading, traceback
+
+# Number of items a stage can run ahead of the next one
+PIPELINE_DEPTH = 8
+
+
+# Calls func and returns (error, result), with the formatted traceback as the error
+# if it raised
+def call(func, *args):
+    try:
+        return None, func(*args)
+    except Exception:
+        return traceback.format_exc(), None
+
+
+# Runs every item through three stages: read(item) in a reader thread,
+# process(item, read result) in the calling thread and write(item, process result)
+# in a writer thread. The stages are connected by queues of at most depth items, so
+# reads run ahead of processing and writes are flushed behind it, while memory use
+# stays bounded. Reads and writes of files release the GIL, so they overlap with
+# processing.
+# Returns the error of each item in order: None, or the traceback of the stage that
+# failed, after which its later stages are skipped.
+def run_pipeline(items, read, process, write, depth=PIPELINE_DEPTH):
+    items = list(items)
+    errors = [None] * len(items)
+    read_queue = queue.Queue(depth)
+    write_queue = queue.Queue(depth)
+
+    def reader():
+        for index, item in enumerate(items):
+            read_queue.put((index, *call(read, item)))
+        read_queue.put(None)
+
+    def writer():
+        while (entry := write_queue.get()) is not None:
+            index, error, result = entry
+            if error is None:
+                error, _ = call(write, items[index], result)
+            errors[index] = error
+
+    # Daemon threads do not keep the process alive if processing is interrupted
+    threads = [
+        threading.Thread(target=reader, daemon=True),
+        threading.Thread(target=writer, daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        while (entry := read_queue.get()) is not None:
+            index, error, result = entry
+            if error is None:
+                error, result = call(process, items[index], result)
+            write_queue.put((index, error, result))
+    finally:
+        write_queue.put(None)
+    threads[1].join()
+    return errors
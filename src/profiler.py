@@ -0,0 +1,124 @@
+import os, json, time, threading
+
+
+# A timed section of the build, recorded when it ends. CPU time is that of the thread
+# running the stage, as pages are read and written in threads alongside rendering.
+class Stage:
+    __slots__ = ("profiler", "name", "page", "args", "wall", "cpu")
+
+    def __init__(self, profiler, name, page, args):
+        self.profiler = profiler
+        self.name = name
+        self.page = page
+        self.args = args
+
+    def __enter__(self):
+        self.wall = time.perf_counter_ns()
+        self.cpu = time.thread_time_ns()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter_ns() - self.wall
+        cpu = time.thread_time_ns() - self.cpu
+        self.profiler.record(self.name, self.page, self.wall, wall, cpu, self.args)
+
+
+# Records wall-clock and CPU time of build stages and pages, plus counters
+# such as blocks or bytes written, and exports them as Chrome trace events
+class Profiler:
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+
+    # Times a stage: with profiler.stage("read", page): ...
+    # Counters added to args while the stage runs are recorded with it.
+    def stage(self, name, page=None, args=None):
+        return Stage(self, name, page, {} if args is None else args)
+
+    def record(self, name, page, start_ns, wall_ns, cpu_ns, args):
+        self.events.append(
+            {
+                "name": name,
+                "cat": "page" if name == "page" else "stage",
+                "ph": "X",
+                # perf_counter is monotonic across processes, so events recorded
+                # in worker processes line up with the main process
+                "ts": start_ns / 1000,
+                "dur": wall_ns / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"page": page, "cpu_ms": cpu_ns / 1e6, **args},
+            }
+        )
+
+    # Adds events recorded by another profiler, for example in a worker process
+    def merge(self, events):
+        self.events.extend(events)
+
+    # Returns {stage: (count, wall seconds, cpu seconds)} summed over all events
+    def stage_totals(self):
+        totals = {}
+        for event in self.events:
+            if event["cat"] != "stage":
+                continue
+            count, wall, cpu = totals.get(event["name"], (0, 0.0, 0.0))
+            totals[event["name"]] = (
+                count + 1,
+                wall + event["dur"] / 1e6,
+                cpu + event["args"]["cpu_ms"] / 1e3,
+            )
+        return totals
+
+    # Returns the page events, slowest first
+    def slowest_pages(self, limit=10):
+        pages = [event for event in self.events if event["cat"] == "page"]
+        return sorted(pages, key=lambda event: event["dur"], reverse=True)[:limit]
+
+    def report(self, limit=10):
+        print(f"{'stage':>12} {'count':>7} {'wall ms':>10} {'cpu ms':>10}")
+        for name, (count, wall, cpu) in self.stage_totals().items():
+            print(f"{name:>12} {count:>7} {wall * 1000:>10.2f} {cpu * 1000:>10.2f}")
+        print("Slowest pages:")
+        for event in self.slowest_pages(limit):
+            args = event["args"]
+            counters = ", ".join(
+                f"{key} {value}"
+                for key, value in args.items()
+                if key not in ("page", "cpu_ms")
+            )
+            print(f"{event['dur'] / 1000:10.2f} ms  {args['page']} ({counters})")
+
+    def write_trace(self, path):
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+# Stage returned when profiling is off, entering and leaving it does nothing
+class NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+# Profiler used when profiling is off. Its stages are a shared no-op object,
+# so instrumented code costs one method call per stage.
+class NullProfiler:
+    enabled = False
+    events = ()
+
+    def stage(self, name, page=None, args=None):
+        return NULL_STAGE
+
+    def merge(self, events):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
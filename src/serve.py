@@ -0,0 +1,261 @@
+import os, hashlib, mimetypes, threading
+from functools import partial
+from urllib.parse import urlsplit, unquote, quote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from manifest import load_manifest, output_stat
+from compress import is_compressible, gzip_bytes
+from links import output_urls
+
+RELOAD_PATH = "/__livereload"
+RELOAD_SCRIPT = (
+    f'<script>new EventSource("{RELOAD_PATH}").onmessage = '
+    "() => location.reload();</script>"
+)
+
+
+# Lets request threads wait for the next rebuild
+class ReloadNotifier:
+    def __init__(self):
+        self.version = 0
+        self.condition = threading.Condition()
+
+    def notify(self):
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+
+    # Waits until the version is newer than the given one and returns the current version
+    def wait(self, version, timeout=None):
+        with self.condition:
+            self.condition.wait_for(lambda: self.version > version, timeout)
+            return self.version
+
+
+# Adds the live reload script to a HTML page
+def inject_reload_script(html):
+    index = html.rfind(b"</body>")
+    if index == -1:
+        return html + RELOAD_SCRIPT.encode()
+    return html[:index] + RELOAD_SCRIPT.encode() + html[index:]
+
+
+# A file held in memory: its contents, their gzip-compressed variant if it is worth
+# sending, the ETag derived from the content hash and the content type
+class Resource:
+    __slots__ = ("body", "gzip", "etag", "content_type")
+
+    def __init__(self, body, gzip, etag, content_type):
+        self.body = body
+        self.gzip = gzip
+        self.etag = etag
+        self.content_type = content_type
+
+    def __repr__(self):
+        return f"Resource({self.etag}, {self.content_type}, {len(self.body)})"
+
+
+def content_type(rel_path):
+    if rel_path.endswith(".html"):
+        return "text/html; charset=utf-8"
+    guessed = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+    return guessed + "; charset=utf-8" if guessed.startswith("text/") else guessed
+
+
+# The pages and assets of an output directory, held in memory and served by URL.
+# The files are those listed in the build manifest. refresh updates the ones written
+# since the last refresh and leaves the others in memory. Resources are kept by content
+# hash, so files with the same contents share one copy. Routes are replaced as a whole,
+# so requests served during a refresh see either the old or the new site.
+# transform_html, if given, is applied to the contents of HTML pages as they are read.
+class SiteCache:
+    def __init__(self, directory, transform_html=None):
+        self.directory = directory
+        self.transform_html = transform_html
+        self.files = {}  # Output path: (output stat, Resource)
+        self.routes = {}  # URL: Resource
+        self.refresh()
+
+    # Updates the files changed since the last refresh and returns how many were updated.
+    # written maps the outputs written by a build to their contents, or to None for
+    # outputs to read from disk; the other files are kept without being checked. Without
+    # it, files are read again when their size or mtime changed.
+    def refresh(self, written=None):
+        manifest = load_manifest(self.directory)
+        outputs = list(manifest["pages"])
+        for rel_path, entry in manifest["assets"].items():
+            outputs.append(entry.get("path", rel_path))
+
+        resources = {
+            (resource.etag, resource.content_type): resource
+            for _, resource in self.files.values()
+        }
+        files = {}
+        updated = 0
+        for rel_path in outputs:
+            previous = self.files.get(rel_path)
+            if previous and written is not None and rel_path not in written:
+                files[rel_path] = previous
+                continue
+            path = os.path.join(self.directory, rel_path)
+            stat = output_stat(path)
+            if stat is None:
+                continue
+            if previous and written is None and previous[0] == stat:
+                files[rel_path] = previous
+                continue
+            body = written.get(rel_path) if written else None
+            if body is None:
+                with open(path, "rb") as f:
+                    body = f.read()
+            updated += 1
+            html = rel_path.endswith(".html")
+            if html and self.transform_html:
+                body = self.transform_html(body)
+            etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+            key = (etag, content_type(path))
+            if key not in resources:
+                compressed = None
+                if is_compressible(rel_path):
+                    compressed = self.precompressed(manifest, rel_path, stat, html)
+                    if compressed is None:
+                        compressed = gzip_bytes(body)
+                resources[key] = Resource(body, compressed, *key)
+            files[rel_path] = (stat, resources[key])
+
+        routes = {}
+        for rel_path, (_, resource) in sorted(files.items()):
+            for url in output_urls(rel_path):
+                routes.setdefault(url, resource)
+        self.files = files
+        self.routes = routes
+        return updated
+
+    # Returns the contents of the gzip sibling written by the build for an output if it
+    # is up to date, so the server does not compress the output again
+    def precompressed(self, manifest, rel_path, stat, html):
+        entry = manifest["compressed"].get(rel_path)
+        # Transformed pages no longer match their sibling
+        if not entry or not entry.get("gz") or (html and self.transform_html):
+            return None
+        if entry["output"] != stat:
+            return None
+        try:
+            with open(os.path.join(self.directory, rel_path + ".gz"), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+# Checks whether an Accept-Encoding header allows a gzip-compressed response
+def accepts_gzip(header):
+    for coding in header.split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        quality = params.strip().lower()
+        if quality.startswith("q="):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+# Checks whether an If-None-Match header matches an ETag. Weak ETags match too, as
+# If-None-Match uses the weak comparison.
+def etag_matches(header, etag):
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in tags or "W/" + etag in tags
+
+
+# Serves the files of a SiteCache from memory. Responses carry an ETag, so browsers
+# revalidate with If-None-Match and get a 304 without a body while a file is unchanged,
+# and are compressed with gzip when the client accepts it.
+# With a notifier, a server-sent events stream on RELOAD_PATH sends an event after
+# every rebuild.
+class SiteHandler(BaseHTTPRequestHandler):
+    # Keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, *args, site=None, notifier=None, **kwargs):
+        self.site = site
+        self.notifier = notifier
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        self.send_resource(True)
+
+    def do_HEAD(self):
+        self.send_resource(False)
+
+    def send_resource(self, with_body):
+        url = urlsplit(self.path)
+        path = unquote(url.path)
+        if self.notifier and path == RELOAD_PATH:
+            return self.send_reload_events()
+        # Read once, a refresh replaces the routes as a whole
+        routes = self.site.routes
+        if not path.endswith("/") and path + "/" in routes:
+            # Directories are served with a trailing slash, so relative URLs work
+            location = quote(path) + "/" + (f"?{url.query}" if url.query else "")
+            self.send_response(301)
+            self.send_header("Location", location)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        resource = routes.get(path)
+        if resource is None:
+            return self.send_error(404)
+
+        encoding = self.headers.get("Accept-Encoding", "")
+        compressed = resource.gzip is not None and accepts_gzip(encoding)
+        # Each encoding is a different representation with its own ETag
+        etag = resource.etag[:-1] + '-gzip"' if compressed else resource.etag
+        not_modified = etag_matches(self.headers.get("If-None-Match", ""), etag)
+        self.send_response(304 if not_modified else 200)
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        if resource.gzip is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        if not_modified:
+            self.end_headers()
+            return
+        body = resource.gzip if compressed else resource.body
+        self.send_header("Content-Type", resource.content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if compressed:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if with_body:
+            self.wfile.write(body)
+
+    def send_reload_events(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        version = self.notifier.version
+        try:
+            while True:
+                current = self.notifier.wait(version, timeout=15)
+                # A comment line keeps idle connections open
+                message = b"data: reload\n\n" if current > version else b": ping\n\n"
+                version = current
+                self.wfile.write(message)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Starts serving a SiteCache on a port in a background thread
+def start_server(site, port, notifier=None):
+    handler = partial(SiteHandler, site=site, notifier=notifier)
+    server = ThreadingHTTPServer(("", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
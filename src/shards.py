@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+
+import os, sys, filecmp, hashlib, argparse
+from manifest import load_manifest, save_manifest, new_manifest, prune_outputs
+from sync import copy_file
+from links import find_broken_links
+
+# Manifest sections combined by a merge
+MERGED_SECTIONS = ("pages", "assets", "compressed", "metadata")
+
+
+# Parses a shard given as "i/N" (the i-th of N shards, counting from 1) into (i, N)
+def parse_shard(value):
+    index, _, count = value.partition("/")
+    try:
+        index, count = int(index), int(count)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a shard as i/N, got {value!r}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard {index} is not between 1 and {count}")
+    return index, count
+
+
+# Checks whether a source belongs to a shard. Sources are assigned by the hash of their
+# relative path, so every machine building a shard makes the same choice.
+def in_shard(rel_path, shard):
+    index, count = shard
+    digest = hashlib.sha256(rel_path.replace(os.sep, "/").encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count == index - 1
+
+
+# Returns the output directory of a shard of the live output directory,
+# such as docs.shards/2-of-4
+def shard_dir(live, shard):
+    index, count = shard
+    return os.path.join(live + ".shards", f"{index}-of-{count}")
+
+
+# Returns the files listed in a manifest, relative to its directory: pages, synced
+# assets under their output names and compressed siblings
+def manifest_outputs(manifest):
+    outputs = list(manifest["pages"])
+    for rel_path, entry in manifest["assets"].items():
+        outputs.append(entry.get("path", rel_path))
+    for rel_path, entry in manifest["compressed"].items():
+        if entry.get("gz"):
+            outputs.append(rel_path + ".gz")
+    return outputs
+
+
+# Loads the manifests of shard builds as (shard, directory, manifest), by shard.
+# Raises ValueError unless the directories are exactly the shards of one build.
+def load_shards(shard_dirs):
+    shards = []
+    for path in shard_dirs:
+        manifest = load_manifest(path)
+        if "shard" not in manifest:
+            raise ValueError(f"{path} is not the output of a shard build")
+        shard = manifest["shard"]
+        shards.append(((shard["index"], shard["count"]), path, manifest))
+    if not shards:
+        raise ValueError("no shards to merge")
+    shards.sort(key=lambda shard: shard[0])
+    counts = {count for (_, count), _, _ in shards}
+    if len(counts) > 1:
+        raise ValueError(f"shards of builds with different shard counts {counts}")
+    indexes = [index for (index, _), _, _ in shards]
+    if indexes != list(range(1, counts.pop() + 1)):
+        raise ValueError(f"expected each shard once, got shards {indexes}")
+    return shards
+
+
+# Merges the outputs of shard builds into dest, hardlinking them where possible, and
+# writes a manifest covering all of them, so dest can also be built incrementally
+# afterwards. Files of earlier outputs of dest that no shard produced are removed.
+# An output produced by more than one shard must be identical in each; otherwise it is
+# a conflict and nothing is written. Returns the conflicts as (output path, shard
+# directories) pairs.
+def merge_shards(shard_dirs, dest):
+    merged = new_manifest()
+    sources = {}  # Output path: directory of the shard it is taken from
+    conflicts = {}
+    for _, directory, manifest in load_shards(shard_dirs):
+        for rel_path in manifest_outputs(manifest):
+            if rel_path not in sources:
+                sources[rel_path] = directory
+            elif not filecmp.cmp(
+                os.path.join(sources[rel_path], rel_path),
+                os.path.join(directory, rel_path),
+                shallow=False,
+            ):
+                conflicts.setdefault(rel_path, [sources[rel_path]]).append(directory)
+        # Entries of the first shard are kept, like its files
+        for section in MERGED_SECTIONS:
+            for key, entry in manifest[section].items():
+                merged[section].setdefault(key, entry)
+    if conflicts:
+        return sorted(conflicts.items())
+
+    linked = 0
+    for rel_path, directory in sorted(sources.items()):
+        src_path = os.path.join(directory, rel_path)
+        dest_path = os.path.join(dest, rel_path)
+        if os.path.exists(dest_path) and os.path.samefile(src_path, dest_path):
+            continue
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        copy_file(src_path, dest_path, hardlink=True)
+        linked += 1
+    old_outputs = dict.fromkeys(manifest_outputs(load_manifest(dest)))
+    removed = prune_outputs(old_outputs, sources, dest)
+    save_manifest(dest, merged)
+    print(
+        f"Merged {len(shard_dirs)} shards into {dest}/: {linked} linked, "
+        f"{len(removed)} removed, {len(sources) - linked} unchanged"
+    )
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge the outputs of shard builds")
+    parser.add_argument(
+        "shards",
+        nargs="*",
+        help="shard output directories (default: every shard in docs.shards/)",
+    )
+    parser.add_argument("--output", default="docs")
+    args = parser.parse_args()
+
+    shard_dirs = args.shards
+    if not shard_dirs:
+        shards_root = args.output + ".shards"
+        if os.path.isdir(shards_root):
+            names = sorted(os.listdir(shards_root))
+            shard_dirs = [os.path.join(shards_root, name) for name in names]
+    try:
+        conflicts = merge_shards(shard_dirs, args.output)
+    except ValueError as error:
+        sys.exit(f"Cannot merge shards: {error}")
+    for rel_path, directories in conflicts:
+        shards = ", ".join(directories)
+        print(f"Conflict: {rel_path} differs in {shards}", file=sys.stderr)
+    if conflicts:
+        sys.exit(f"{len(conflicts)} conflict(s), {args.output}/ was left unchanged")
+
+    # Shards only check the links between their own pages, so all links are checked
+    # once they are merged
+    broken_links = find_broken_links(load_manifest(args.output))
+    for source, url in broken_links:
+        print(f"Broken link in content/{source}: {url}", file=sys.stderr)
+    if broken_links:
+        print(f"{len(broken_links)} broken link(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os, time, shutil
+
+
+# Returns the directory holding the staged builds of an output directory
+def builds_dir(live):
+    return os.path.abspath(live) + ".builds"
+
+
+# Recreates the tree of src in dest with every file hardlinked instead of copied.
+# Files are copied where hardlinks are not supported.
+def link_tree(src, dest):
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        os.makedirs(os.path.join(dest, rel_dir), exist_ok=True)
+        with os.scandir(os.path.join(src, rel_dir)) as entries:
+            for entry in entries:
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(rel_path)
+                    continue
+                try:
+                    os.link(entry.path, os.path.join(dest, rel_path))
+                except OSError:
+                    shutil.copy2(entry.path, os.path.join(dest, rel_path))
+
+
+# Creates a new staging directory for a build of live, starting from hardlinks of the
+# files of the live build unless clean is set. Files in the staging directory must be
+# replaced, never written in place, as they share their contents with the live build.
+def prepare_staging(live, clean=False):
+    staging = os.path.join(builds_dir(live), f"build-{time.time_ns()}")
+    if not clean and os.path.isdir(live):
+        link_tree(os.path.realpath(live), staging)
+    else:
+        os.makedirs(staging)
+    return staging
+
+
+# Publishes a staged build by pointing the live path, a symlink, at it. The symlink is
+# swapped with a rename, so readers of the live path see either the old or the new
+# build and never a partial one. A live directory left by an unstaged build is moved
+# into the builds directory first. The previous build is kept for requests that are
+# still reading it, older builds and abandoned staging directories are removed.
+def publish(live, staging):
+    builds = builds_dir(live)
+    previous = os.path.realpath(live) if os.path.islink(live) else None
+    if os.path.isdir(live) and not os.path.islink(live):
+        previous = os.path.join(builds, f"build-{time.time_ns()}")
+        os.rename(live, previous)
+    link_path = f"{live}.{os.getpid()}.tmp"
+    if os.path.lexists(link_path):
+        os.remove(link_path)
+    # A relative target keeps working when the whole site directory is moved
+    target = os.path.relpath(staging, os.path.dirname(os.path.abspath(live)))
+    os.symlink(target, link_path)
+    os.replace(link_path, live)
+
+    for name in os.listdir(builds):
+        path = os.path.join(builds, name)
+        if path not in (staging, previous):
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,179 @@
+import os, shutil
+from manifest import file_fingerprint, hash_file, output_stat, prune_outputs
+from discover import scan_tree
+from urls import AssetMap
+
+
+# Copies a single file with the fastest method the filesystem supports.
+# An existing destination is removed first, so a hardlinked output is
+# never written through to its source.
+def copy_file(src, dest, hardlink=False):
+    if os.path.lexists(dest):
+        os.remove(dest)
+    if hardlink:
+        try:
+            os.link(src, dest)
+            return
+        except OSError:
+            pass
+    try:
+        copy_file_range(src, dest)
+    except (OSError, AttributeError):
+        # shutil.copyfile uses sendfile where the platform supports it
+        shutil.copyfile(src, dest)
+    st = os.stat(src)
+    os.utime(dest, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+# Copies a file inside the kernel with copy_file_range, avoiding user space buffers.
+# Raises OSError (or AttributeError on platforms without it) if it is not supported.
+def copy_file_range(src, dest):
+    with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            copied = os.copy_file_range(fsrc.fileno(), fdest.fileno(), remaining)
+            if copied == 0:
+                break
+            remaining -= copied
+
+
+# Checks whether the source of an asset matches the one recorded in the manifest.
+# Without checksum, only size and mtime are compared.
+def is_same_source(previous, source, checksum):
+    if checksum:
+        return previous.get("hash") == source["hash"]
+    return (
+        previous.get("size") == source["size"]
+        and previous.get("mtime_ns") == source["mtime_ns"]
+    )
+
+
+# Returns the name of a file with a fingerprint of its contents,
+# such as images/tom.3f9a1c2b.png for images/tom.png
+def fingerprinted_path(rel_path, content_hash):
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{content_hash[:8]}{ext}"
+
+
+# Returns the AssetMap of the assets synced with fingerprinted names
+def load_asset_map(manifest):
+    urls = {}
+    for rel_path, entry in manifest["assets"].items():
+        if "path" in entry:
+            url = "/" + rel_path.replace(os.sep, "/")
+            urls[url] = "/" + entry["path"].replace(os.sep, "/")
+    return AssetMap(urls)
+
+
+# Returns {output path: entry} for asset entries keyed by their source path
+def outputs_by_path(entries):
+    return {entry.get("path", rel_path): entry for rel_path, entry in entries.items()}
+
+
+# Synchronises the source directory into the destination directory.
+# Only new or changed files are copied and files synced by an earlier build
+# whose source was removed are deleted. Paths in exclude (for example page outputs)
+# are left alone. The "assets" section of the manifest is updated in place.
+# Files accepted by optimizer (an AssetOptimizer) are optimized instead of copied.
+# With fingerprint, files other than HTML pages are written under names containing
+# the hash of their output, recorded as "path" in their manifest entry.
+# files are the SourceFiles of the source directory, which is scanned if they are not
+# given. Files whose source exists but is not among them keep their outputs.
+# If written is given, the outputs copied or optimized are added to it, mapped to None.
+def sync_directory(
+    src,
+    dest,
+    manifest,
+    checksum=False,
+    hardlink=False,
+    exclude=(),
+    optimizer=None,
+    fingerprint=False,
+    files=None,
+    written=None,
+):
+    old_entries = manifest["assets"]
+    new_entries = {}
+    copied = unchanged = 0
+    pending = []  # Files to optimize as (rel_path, src_path, dest_path)
+    updated = []  # Files copied or optimized by this sync
+
+    if files is None:
+        files = scan_tree(src)
+    for source_file in files:
+        rel_path = source_file.rel_path
+        if rel_path in exclude:
+            continue
+        src_path = source_file.path
+        dest_path = os.path.join(dest, rel_path)
+        previous = old_entries.get(rel_path)
+        optimized = optimizer is not None and optimizer.accepts(rel_path)
+        fingerprinted = fingerprint and not rel_path.endswith(".html")
+
+        source = source_file.stat()
+        if checksum:
+            source = file_fingerprint(src_path, previous and previous["source"], source)
+
+        if (
+            previous
+            and is_same_source(previous["source"], source, checksum)
+            and previous.get("optimized", False) == optimized
+            and ("path" in previous) == fingerprinted
+            and previous["output"]
+            == output_stat(os.path.join(dest, previous.get("path", rel_path)))
+        ):
+            # Without checksum the source is unchanged, and its hash is kept for later
+            # builds with checksums
+            if not checksum:
+                source = previous["source"]
+            new_entries[rel_path] = {**previous, "source": source}
+            unchanged += 1
+            continue
+
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        if optimized:
+            pending.append((rel_path, src_path, dest_path))
+        else:
+            copy_file(src_path, dest_path, hardlink)
+            copied += 1
+        new_entries[rel_path] = {"source": source}
+        if optimized:
+            new_entries[rel_path]["optimized"] = True
+        updated.append(rel_path)
+
+    if pending:
+        results = optimizer.run([job[1:] for job in pending])
+        original = sum(size for size, _ in results)
+        saved = original - sum(size for _, size in results)
+        print(
+            f"Optimized {len(pending)} assets, {saved // 1024} KiB smaller "
+            f"({saved / max(original, 1):.1%})"
+        )
+    for rel_path in updated:
+        entry = new_entries[rel_path]
+        if fingerprint and not rel_path.endswith(".html"):
+            # The name is taken from the output, so optimized files get a new name
+            # whenever their optimized contents change
+            dest_path = os.path.join(dest, rel_path)
+            entry["path"] = fingerprinted_path(rel_path, hash_file(dest_path))
+            os.replace(dest_path, os.path.join(dest, entry["path"]))
+        entry["output"] = output_stat(os.path.join(dest, entry.get("path", rel_path)))
+        if written is not None:
+            written[entry.get("path", rel_path)] = None
+
+    # Files left out of this sync, for example by --include-static, are kept as they were
+    scanned = {source_file.rel_path for source_file in files}
+    for rel_path, entry in old_entries.items():
+        if (
+            rel_path not in scanned
+            and rel_path not in exclude
+            and os.path.exists(os.path.join(src, rel_path))
+        ):
+            new_entries[rel_path] = entry
+    stale = {k: v for k, v in old_entries.items() if k not in exclude}
+    removed = prune_outputs(outputs_by_path(stale), outputs_by_path(new_entries), dest)
+    manifest["assets"] = new_entries
+    print(
+        f"Synced {src}/ to {dest}/: {copied} copied, {len(pending)} optimized, "
+        f"{len(removed)} removed, {unchanged} unchanged"
+    )
@@ -0,0 +1,240 @@
+import os, re, hashlib
+
+# Matches {{ Name }} slots and {% include "path" %} directives
+TAG_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}|\{%\s*include\s+\"([^\"]+)\"\s*%\}")
+# Elements whose contents are kept exactly as they are when minifying
+RAW_ELEMENT_PATTERN = re.compile(
+    r"<(pre|textarea|script|style)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL
+)
+# Comments removed when minifying, conditional comments (<!--[if IE]>) are kept
+COMMENT_PATTERN = re.compile(r"<!--(?!\[).*?-->", re.DOTALL)
+# Matches raw elements, which are skipped, and the runs of whitespace between them
+WHITESPACE_PATTERN = re.compile(
+    RAW_ELEMENT_PATTERN.pattern + r"|(\s+)", re.IGNORECASE | re.DOTALL
+)
+# Matches the name of the tag at the start of a string, or the last tag of a string
+TAG_NAME_PATTERN = re.compile(r"<\s*/?\s*([\w!-]+)")
+# Elements that flow with the text around them, so whitespace next to them is a space
+# on the page. Whitespace next to other elements is not rendered.
+INLINE_ELEMENTS = {
+    "a",
+    "abbr",
+    "b",
+    "bdi",
+    "bdo",
+    "br",
+    "button",
+    "cite",
+    "code",
+    "data",
+    "dfn",
+    "em",
+    "i",
+    "img",
+    "input",
+    "kbd",
+    "label",
+    "mark",
+    "q",
+    "s",
+    "samp",
+    "select",
+    "small",
+    "span",
+    "strong",
+    "sub",
+    "sup",
+    "textarea",
+    "time",
+    "u",
+    "var",
+    "wbr",
+}
+# Stands in for the slots while a template's segments are minified together
+SLOT_MARKER = "\0"
+
+
+# A template compiled into literal segments and the indices of its named slots.
+# Rendering copies the segments, fills the slots and joins them once.
+class Template:
+    def __init__(self, segments, slots, digest):
+        self.segments = segments  # Literal text, with "" placeholders at slot indices
+        self.slots = slots  # List of (index, name)
+        self.hash = digest  # Hash of the template and everything it includes
+
+    def render(self, values):
+        parts = self.segments.copy()
+        for index, name in self.slots:
+            parts[index] = values.get(name, "")
+        return "".join(parts)
+
+    # Writes the rendered template into writer without building the page in memory.
+    # Slot values with a render_to method, such as HTML nodes, are streamed into writer.
+    def render_to(self, writer, values):
+        # Every slot is preceded by a literal segment, and one literal segment ends the template
+        for index, name in self.slots:
+            writer.write(self.segments[index - 1])
+            value = values.get(name, "")
+            if hasattr(value, "render_to"):
+                value.render_to(writer)
+            else:
+                writer.write(value)
+        writer.write(self.segments[-1])
+
+    def __repr__(self):
+        return f"Template({self.segments}, {self.slots})"
+
+
+# Reads a template and splits it into literal parts and slots, expanding includes.
+# Includes are resolved relative to the file that includes them.
+# The href and src attributes of the literal parts are rewritten with url_rewriter.
+def parse_template(path, digest, url_rewriter=None, including=()):
+    path = os.path.abspath(path)
+    if path in including:
+        raise ValueError(f"template {path} includes itself")
+    with open(path) as f:
+        text = f.read()
+    digest.update(path.encode() + b"\0" + text.encode() + b"\0")
+
+    parts = []
+    start_idx = 0
+    for match in TAG_PATTERN.finditer(text):
+        parts.append(text[start_idx : match.start()])
+        slot, include = match.groups()
+        if slot:
+            parts.append((slot,))
+        else:
+            include_path = os.path.join(os.path.dirname(path), include)
+            parts.extend(
+                parse_template(include_path, digest, url_rewriter, including + (path,))
+            )
+        start_idx = match.end()
+    parts.append(text[start_idx:])
+    if url_rewriter:
+        parts = [
+            url_rewriter.rewrite_html(part) if isinstance(part, str) else part
+            for part in parts
+        ]
+    return parts
+
+
+# Minifies a piece of HTML: comments are removed and runs of whitespace become a single
+# space. Runs containing a line break that only indent markup are dropped: those at the
+# start or end of the document and those between two tags or slots where at least one
+# side is a tag of a block element, such as "</li>\n  <li>". Whitespace next to text or
+# between inline elements is rendered, so it is kept as a space. The contents of raw
+# elements such as <pre> are kept exactly as they are.
+def minify_html(html):
+    parts = []
+    start_idx = 0
+    for match in RAW_ELEMENT_PATTERN.finditer(html):
+        parts.append(COMMENT_PATTERN.sub("", html[start_idx : match.start()]))
+        parts.append(match.group())
+        start_idx = match.end()
+    parts.append(COMMENT_PATTERN.sub("", html[start_idx:]))
+    html = "".join(parts)
+
+    def collapse(match):
+        if match.group(2) is None:
+            return match.group()
+        start, end = match.span()
+        if start == 0 or end == len(html):
+            return ""
+        if "\n" not in match.group():
+            return " "
+        before = boundary_element(html[:start], before=True)
+        after = boundary_element(html[end:], before=False)
+        if before is None or after is None:
+            return " "
+        return "" if (before + after).strip() else " "
+
+    return WHITESPACE_PATTERN.sub(collapse, html)
+
+
+# Classifies what text ends with (before) or starts with: the element name for a tag
+# of an element that is not inline, "" for a slot or an inline element, and None for
+# text
+def boundary_element(text, before):
+    char = text[-1] if before else text[0]
+    if char == SLOT_MARKER:
+        return ""
+    if char != (">" if before else "<"):
+        return None
+    match = TAG_NAME_PATTERN.match(text[text.rfind("<") :] if before else text)
+    name = match.group(1).lower() if match else "!"
+    return "" if name in INLINE_ELEMENTS else name
+
+
+# Compiles a template file, merging adjacent literal parts into single segments.
+# URLs in the template are rewritten once here instead of on every page.
+# With minify, the literal segments are minified once here as well.
+def compile_template(path, url_rewriter=None, minify=False):
+    digest = hashlib.sha256()
+    segments = []
+    slots = []
+    literal = []
+    for part in parse_template(path, digest, url_rewriter):
+        if isinstance(part, tuple):
+            segments.append("".join(literal))
+            literal = []
+            slots.append((len(segments), part[0]))
+            segments.append("")
+        else:
+            literal.append(part)
+    segments.append("".join(literal))
+    if minify:
+        # The segments are minified as one text so that elements such as
+        # <pre>{{ Content }}</pre> are recognised around the slots
+        segments = minify_html(SLOT_MARKER.join(segments)).split(SLOT_MARKER)
+    return Template(segments, slots, digest.hexdigest())
+
+
+_template_cache = {}
+
+
+# Returns the compiled template for a path, URL rewriting and minification,
+# compiling it only the first time it is used
+def load_template(path, url_rewriter=None, minify=False):
+    key = (os.path.abspath(path), url_rewriter.key if url_rewriter else None, minify)
+    template = _template_cache.get(key)
+    if template is None:
+        template = compile_template(path, url_rewriter, minify)
+        _template_cache[key] = template
+    return template
+
+
+# Forgets all compiled templates, for example after a template file was edited
+def clear_template_cache():
+    _template_cache.clear()
+
+
+# Selects the layout of each page from a layouts directory mirroring the content directory.
+# For content/blog/tom/index.md the candidates are, most specific first:
+# layouts/blog/tom/index.html (the page itself), layouts/blog/tom.html and
+# layouts/blog.html (its directories). The default template is used if none exist.
+class LayoutResolver:
+    def __init__(self, layouts_dir, default_path):
+        self.layouts_dir = layouts_dir
+        self.default_path = default_path
+        self._dir_layouts = {}
+
+    def resolve(self, source_rel_path):
+        page_layout = os.path.join(
+            self.layouts_dir, os.path.splitext(source_rel_path)[0] + ".html"
+        )
+        if os.path.isfile(page_layout):
+            return page_layout
+        return self._dir_layout(os.path.dirname(source_rel_path))
+
+    # Directory lookups are cached, as every page in a directory shares them
+    def _dir_layout(self, rel_dir):
+        if rel_dir in self._dir_layouts:
+            return self._dir_layouts[rel_dir]
+        if not rel_dir:
+            layout = self.default_path
+        else:
+            layout = os.path.join(self.layouts_dir, rel_dir + ".html")
+            if not os.path.isfile(layout):
+                layout = self._dir_layout(os.path.dirname(rel_dir))
+        self._dir_layouts[rel_dir] = layout
+        return layout
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from benchmark import (
+    generate_corpus,
+    read_corpus,
+    run_benchmarks,
+    find_regressions,
+    parse_mix,
+)
+from markdown_formatting import markdown_to_html_node
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_generate_corpus(self):
+        with tempfile.TemporaryDirectory() as first:
+            second = os.path.join(first, "second")
+            generate_corpus(first, 12, 10, seed=3)
+            generate_corpus(second, 12, 10, seed=3)
+            pages = read_corpus(first)
+            self.assertEqual(len(pages), 12)
+            self.assertEqual(pages, read_corpus(second))
+            self.assertTrue(os.path.exists(os.path.join(first, "template.html")))
+            # Every generated page must be valid input for the parser
+            for page in pages:
+                markdown_to_html_node(page).to_html()
+
+    def test_incremental_build_is_up_to_date(self):
+        with tempfile.TemporaryDirectory() as path:
+            generate_corpus(path, 4, 5, seed=1)
+            with mock.patch("main.run_page_jobs", wraps=main.run_page_jobs) as run:
+                run_benchmarks(path, 1)
+            # The timed incremental build comes last and regenerates nothing
+            self.assertEqual(len(run.call_args_list[-1].args[0]), 0)
+
+    def test_find_regressions(self):
+        baseline = {"stages": {"blocks": 1.0, "inline": 2.0}}
+        results = {"stages": {"blocks": 1.1, "inline": 3.0, "render": 1.0}}
+        self.assertEqual(
+            find_regressions(baseline, results, 0.2), [("inline", 2.0, 3.0)]
+        )
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("paragraph=3,code=1"), {"paragraph": 3, "code": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import gzip
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from compress import precompress_outputs
+from manifest import new_manifest
+from testcase import TempDirTestCase
+
+
+class TestPrecompress(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest = self.dir
+        self.manifest = new_manifest()
+
+    def precompress(self, rel_paths, workers=1):
+        out = StringIO()
+        with redirect_stdout(out):
+            precompress_outputs(self.dest, self.manifest, rel_paths, workers)
+        return out.getvalue()
+
+    def test_compresses_text_outputs(self):
+        page = self.write("blog/index.html", "<p>hello</p>" * 100)
+        self.write("small.css", "body{}")
+        self.write("image.png", "png" * 1000)
+        self.precompress(["blog/index.html", "small.css", "image.png"], workers=2)
+        with gzip.open(page + ".gz", "rt") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 100)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "small.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "image.png.gz")))
+
+    def test_only_changed_outputs(self):
+        page = self.write("index.html", "<p>hello</p>" * 100)
+        self.precompress(["index.html"])
+        inode = os.stat(page + ".gz").st_ino
+        log = self.precompress(["index.html"])
+        self.assertIn("0 of 0 changed", log)
+        self.assertEqual(os.stat(page + ".gz").st_ino, inode)
+
+        # An output that no longer compresses well loses its compressed copy
+        with open(page, "wb") as f:
+            f.write(os.urandom(1000))
+        self.precompress(["index.html"])
+        self.assertFalse(os.path.exists(page + ".gz"))
+
+    def test_removed_outputs(self):
+        page = self.write("blog/index.html", "<p>hello</p>" * 100)
+        self.precompress(["blog/index.html"])
+        self.precompress([])
+        self.assertFalse(os.path.exists(page + ".gz"))
+        self.assertEqual(self.manifest["compressed"], {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import unittest
+from io import StringIO
+
+import content_cache
+from content_cache import ContentCache, CachedContent, mark_url, split_marked
+from markdown_formatting import markdown_to_html_node
+from urls import UrlRewriter
+from testcase import TempDirTestCase
+
+
+class TestContentCache(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = ContentCache(os.path.join(self.dir, "cache"))
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get("abc"))
+        self.cache.put("abc", "Title", ["<p>", "/blog", "</p>"])
+        self.assertEqual(self.cache.get("abc"), ("Title", ["<p>", "/blog", "</p>"]))
+
+    def test_parser_version(self):
+        self.cache.put("abc", "Title", ["<p></p>"])
+        version = content_cache.PARSER_VERSION
+        content_cache.PARSER_VERSION = version + 1
+        try:
+            self.assertIsNone(self.cache.get("abc"))
+        finally:
+            content_cache.PARSER_VERSION = version
+
+    def test_evict_least_recently_used(self):
+        for i, key in enumerate(["old", "used", "new"]):
+            self.cache.put(key, key, ["x" * 100])
+            path = self.cache.entry_path(key)
+            os.utime(path, ns=(i * 10**9, i * 10**9))
+        self.cache.get("used")
+        self.cache.max_size = sum(
+            os.path.getsize(self.cache.entry_path(key)) for key in ("used", "new")
+        )
+        self.assertEqual(self.cache.evict(), 1)
+        self.assertIsNone(self.cache.get("old"))
+        self.assertIsNotNone(self.cache.get("used"))
+        self.assertIsNotNone(self.cache.get("new"))
+
+    def test_cached_content_rewrites_urls(self):
+        markdown = "# Title\n\n[Blog](/blog) and ![Tom](/images/tom.png)"
+        parts = split_marked(markdown_to_html_node(markdown, mark_url).to_html())
+        for rewriter in (UrlRewriter("/site/"), UrlRewriter("/", 2)):
+            out = StringIO()
+            CachedContent(parts, rewriter.rewrite).render_to(out)
+            expected = markdown_to_html_node(markdown, rewriter.rewrite).to_html()
+            self.assertEqual(out.getvalue(), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import unittest
+
+from discover import matches, scan_tree, discover_pages
+from testcase import TempDirTestCase
+
+
+class TestDiscover(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.root = self.dir
+        for rel_path in [
+            "index.md",
+            "b.md",
+            "blog/tom/index.md",
+            "blog/tom/cover.png",
+            "blog.md",
+            "drafts/x.md",
+            "notes.txt",
+        ]:
+            self.write(rel_path, rel_path)
+
+    def scan(self, **globs):
+        return [source.rel_path for source in scan_tree(self.root, **globs)]
+
+    def test_matches(self):
+        self.assertTrue(matches(os.path.join("blog", "a.tmp"), ["*.tmp"]))
+        self.assertTrue(matches(os.path.join("drafts", "a.md"), ["drafts/*"]))
+        self.assertFalse(matches(os.path.join("blog", "drafts"), ["drafts/*"]))
+        self.assertFalse(matches("a.md", []))
+
+    def test_scan_tree(self):
+        sources = scan_tree(self.root)
+        self.assertEqual(
+            [source.rel_path for source in sources],
+            [
+                "b.md",
+                os.path.join("blog", "tom", "cover.png"),
+                os.path.join("blog", "tom", "index.md"),
+                "blog.md",
+                os.path.join("drafts", "x.md"),
+                "index.md",
+                "notes.txt",
+            ],
+        )
+        # Directories sort before files that share their name as a prefix, and the
+        # stat data is taken while scanning
+        index = sources[-2]
+        st = os.stat(index.path)
+        self.assertEqual(index.stat(), {"size": 8, "mtime_ns": st.st_mtime_ns})
+
+    def test_globs(self):
+        self.assertEqual(
+            self.scan(include=["*.md"], exclude=["drafts", "blog"]),
+            ["b.md", "blog.md", "index.md"],
+        )
+        self.assertEqual(
+            self.scan(include=["blog/*"]),
+            [
+                os.path.join("blog", "tom", "cover.png"),
+                os.path.join("blog", "tom", "index.md"),
+            ],
+        )
+
+    def test_missing_root(self):
+        with self.assertRaises(FileNotFoundError):
+            scan_tree(os.path.join(self.root, "missing"))
+
+    def test_discover_pages(self):
+        pages = discover_pages(self.root, "docs", exclude=["drafts"])
+        self.assertEqual(
+            [(source.rel_path, dest_path) for source, dest_path in pages],
+            [
+                ("b.md", os.path.join("docs", "b.html")),
+                (
+                    os.path.join("blog", "tom", "index.md"),
+                    os.path.join("docs", "blog", "tom", "index.html"),
+                ),
+                ("blog.md", os.path.join("docs", "blog.html")),
+                ("index.md", os.path.join("docs", "index.html")),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
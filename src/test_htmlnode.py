@@ -1,6 +1,8 @@
 import unittest
 
 from htmlnode import HTMLNode
+from leafnode import LeafNode
+from parentnode import ParentNode
 
 
 class TestHTMLNode(unittest.TestCase):
@@ -12,6 +14,26 @@ class TestHTMLNode(unittest.TestCase):
         node2 = HTMLNode(None, None, None, {})
         self.assertEqual(node.props_to_html(), expectedResult)
         self.assertEqual(node2.props_to_html(), "")
+        # Empty props are not kept
+        self.assertIsNone(node2.props)
+
+    def test_value_and_children(self):
+        leaf = LeafNode("b", "text")
+        node = HTMLNode("p", "value", [leaf])
+        self.assertIsInstance(node, HTMLNode)
+        self.assertEqual(node.value, "value")
+        self.assertEqual(node.children, [leaf])
+        self.assertIsNone(HTMLNode("p").value)
+
+    def test_compact_nodes(self):
+        leaf = LeafNode("b", "text")
+        parent = ParentNode("p", [leaf])
+        for node in (leaf, parent):
+            self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIsNone(leaf.children)
+        self.assertIsNone(parent.value)
+        heading = ParentNode("h" + str(1), [leaf])
+        self.assertIs(heading.tag, ParentNode("h1", [leaf]).tag)
 
 
 if __name__ == "__main__":
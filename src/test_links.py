@@ -0,0 +1,38 @@
+import unittest
+
+from links import output_urls, link_target, find_broken_links
+from manifest import new_manifest
+
+
+class TestLinks(unittest.TestCase):
+    def test_output_urls(self):
+        self.assertEqual(output_urls("index.html"), ["/index.html", "/"])
+        self.assertEqual(
+            output_urls("blog/tom/index.html"),
+            ["/blog/tom/index.html", "/blog/tom/", "/blog/tom"],
+        )
+        self.assertEqual(output_urls("contact.html"), ["/contact.html", "/contact"])
+        self.assertEqual(output_urls("images/a.png"), ["/images/a.png"])
+
+    def test_link_target(self):
+        self.assertEqual(link_target("/blog/tom#intro"), "/blog/tom")
+        self.assertEqual(link_target("/index.css?v=2"), "/index.css")
+        self.assertEqual(link_target("/images/my%20tom.png"), "/images/my tom.png")
+        self.assertEqual(link_target("/#top"), "/")
+
+    def test_find_broken_links(self):
+        manifest = new_manifest()
+        manifest["pages"]["index.html"] = {
+            "source": "index.md",
+            "links": ["/blog/tom", "/images/a.png", "/blog/gone", "/b.png"],
+        }
+        manifest["pages"]["blog/tom/index.html"] = {"source": "blog/tom/index.md"}
+        manifest["assets"]["images/a.png"] = {"path": "images/a.1234abcd.png"}
+        self.assertEqual(
+            find_broken_links(manifest),
+            [("index.md", "/blog/gone"), ("index.md", "/b.png")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
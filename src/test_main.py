@@ -0,0 +1,263 @@
+import os
+import unittest
+from unittest import mock
+from contextlib import redirect_stdout, redirect_stderr
+from io import StringIO
+
+import main
+from main import build, generate_pages_recursive, parse_args
+from discover import discover_pages
+from manifest import new_manifest
+from content_cache import ContentCache
+from template import clear_template_cache
+from urls import AssetMap
+from testcase import TempDirTestCase
+
+TEMPLATE = "<title>{{ Title }}</title><body>{{ Content }}</body>"
+
+
+class TestGeneratePages(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = os.path.join(self.dir, "content")
+        self.dest = os.path.join(self.dir, "docs")
+        self.template = os.path.join(self.dir, "template.html")
+        self.write(self.template, TEMPLATE)
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n[Blog](/blog)")
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\nText")
+
+    def output(self, *parts):
+        return self.read(os.path.join(self.dest, *parts))
+
+    def generate(
+        self,
+        manifest=None,
+        jobs=1,
+        basepath="/",
+        cache=None,
+        asset_map=None,
+        drafts=False,
+        pages=None,
+        written=None,
+    ):
+        out = StringIO()
+        with redirect_stdout(out), redirect_stderr(StringIO()):
+            failures = generate_pages_recursive(
+                self.content,
+                self.template,
+                self.dest,
+                basepath,
+                manifest,
+                jobs,
+                cache=cache,
+                asset_map=asset_map,
+                drafts=drafts,
+                pages=pages,
+                written=written,
+            )
+        return failures, out.getvalue()
+
+    def test_generate_pages(self):
+        # Only markdown files in the content directory are pages
+        self.write(os.path.join(self.content, "blog", "notes.txt"), "# Notes")
+        failures, _ = self.generate()
+        self.assertEqual(failures, [])
+        self.assertEqual(
+            self.output("index.html"),
+            '<title>Home</title><body><div><h1>Home</h1><p><a href="/blog">Blog</a></p></div></body>',
+        )
+        self.assertIn("<h1>Blog</h1>", self.output("blog", "index.html"))
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog", "notes.html")))
+
+    def test_streaming(self):
+        self.generate()
+        expected = self.output("index.html")
+        threshold = main.STREAM_THRESHOLD
+        main.STREAM_THRESHOLD = 0
+        try:
+            self.generate()
+        finally:
+            main.STREAM_THRESHOLD = threshold
+        self.assertEqual(self.output("index.html"), expected)
+
+    def test_incremental(self):
+        manifest = new_manifest()
+        _, log = self.generate(manifest)
+        self.assertEqual(log.count("Generating page"), 2)
+
+        _, log = self.generate(manifest)
+        self.assertEqual(log.count("Generating page"), 0)
+
+        self.write(os.path.join(self.content, "blog", "index.md"), "# Blog\n\nNew")
+        _, log = self.generate(manifest)
+        self.assertEqual(log.count("Generating page"), 1)
+
+        _, log = self.generate(manifest, basepath="/site/")
+        self.assertEqual(log.count("Generating page"), 2)
+
+        os.remove(os.path.join(self.content, "blog", "index.md"))
+        self.generate(manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "blog")))
+        self.assertEqual(list(manifest["pages"]), ["index.html"])
+
+    def test_links_in_manifest(self):
+        manifest = new_manifest()
+        self.generate(manifest)
+        self.assertEqual(manifest["pages"]["index.html"]["links"], ["/blog"])
+        # Pages that are not regenerated keep their links
+        self.generate(manifest, jobs=2)
+        self.assertEqual(manifest["pages"]["index.html"]["links"], ["/blog"])
+
+    def test_content_cache(self):
+        cache = ContentCache(os.path.join(self.dir, "cache"))
+        manifest = new_manifest()
+        self.generate(manifest, cache=cache)
+        self.write(self.template, "<h1>{{ Title }}</h1>{{ Content }}")
+        clear_template_cache()
+        # Neither the new template nor the new basepath parse the sources again
+        with mock.patch("main.parse_blocks", side_effect=AssertionError):
+            failures, _ = self.generate(manifest, basepath="/site/", cache=cache)
+        self.assertEqual(failures, [])
+        self.assertEqual(
+            self.output("index.html"),
+            '<h1>Home</h1><div><h1>Home</h1><p><a href="/site/blog">Blog</a></p></div>',
+        )
+
+    def test_asset_map(self):
+        self.write(self.template, '<link href="/index.css">{{ Content }}')
+        self.write(os.path.join(self.content, "index.md"), "# Home\n\n![a](/a.png)")
+        manifest = new_manifest()
+        assets = AssetMap({"/index.css": "/index.1.css", "/a.png": "/a.1.png"})
+        self.generate(manifest, asset_map=assets)
+        self.assertEqual(
+            self.output("index.html"),
+            '<link href="/index.1.css"><div><h1>Home</h1>'
+            '<p><img src="/a.1.png" alt="a"></img></p></div>',
+        )
+        # Pages are regenerated when the asset names change
+        assets = AssetMap({"/index.css": "/index.2.css", "/a.png": "/a.1.png"})
+        _, log = self.generate(manifest, asset_map=assets)
+        self.assertEqual(log.count("Generating page"), 2)
+        self.assertIn("/index.2.css", self.output("index.html"))
+
+    def test_front_matter(self):
+        self.write(
+            os.path.join(self.content, "index.md"),
+            "---\ntitle: Welcome\ntags: a, b\n---\n# Home\n\nText",
+        )
+        self.write(
+            os.path.join(self.content, "draft.md"), "---\ndraft: true\n---\n# Draft"
+        )
+        manifest = new_manifest()
+        self.generate(manifest)
+        self.assertEqual(
+            self.output("index.html"),
+            "<title>Welcome</title><body><div><h1>Home</h1><p>Text</p></div></body>",
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "draft.html")))
+        self.assertEqual(manifest["metadata"]["index.md"]["meta"]["tags"], ["a", "b"])
+        self.assertTrue(manifest["metadata"]["draft.md"]["meta"]["draft"])
+
+        self.generate(manifest, drafts=True)
+        self.assertIn("<h1>Draft</h1>", self.output("draft.html"))
+        # The draft is removed again when drafts are left out
+        self.generate(manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "draft.html")))
+
+    def test_filtered_pages_are_kept(self):
+        manifest = new_manifest()
+        self.generate(manifest)
+        self.write(os.path.join(self.content, "blog", "index.md"), "# News")
+        pages = discover_pages(self.content, self.dest, include=["blog/*"])
+        failures, out = self.generate(manifest, pages=pages)
+        self.assertEqual(failures, [])
+        self.assertNotIn("Removed", out)
+        # Pages outside the include globs keep their outputs and manifest entries
+        self.assertIn("<h1>Home</h1>", self.output("index.html"))
+        self.assertIn("<h1>News</h1>", self.output("blog", "index.html"))
+        self.assertEqual(sorted(manifest["pages"]), ["blog/index.html", "index.html"])
+        self.assertEqual(sorted(manifest["metadata"]), ["blog/index.md", "index.md"])
+        # Removed sources are still pruned by a filtered build
+        os.remove(os.path.join(self.content, "index.md"))
+        _, out = self.generate(manifest, pages=pages)
+        self.assertIn("Removed index.html", out)
+        self.assertEqual(sorted(manifest["pages"]), ["blog/index.html"])
+
+    def test_written(self):
+        manifest = new_manifest()
+        written = {}
+        self.generate(manifest, written=written)
+        self.assertEqual(sorted(written), ["blog/index.html", "index.html"])
+        self.assertEqual(written["index.html"], self.output("index.html").encode())
+        # Only the outputs written by a build are listed, those of worker processes
+        # without their contents
+        self.write(os.path.join(self.content, "blog", "index.md"), "# News")
+        self.write(os.path.join(self.content, "about.md"), "# About")
+        written = {}
+        self.generate(manifest, jobs=2, written=written)
+        self.assertEqual(written, {"about.html": None, "blog/index.html": None})
+
+    def test_parallel_failures(self):
+        self.write(os.path.join(self.content, "broken.md"), "# Broken\n\n**unpaired")
+        manifest = new_manifest()
+        failures, _ = self.generate(manifest, jobs=2)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0][0].endswith("broken.md"))
+        self.assertIn("Delimiter is not paired", failures[0][1])
+        self.assertEqual(sorted(manifest["pages"]), ["blog/index.html", "index.html"])
+        self.assertIn("<h1>Home</h1>", self.output("index.html"))
+
+    def test_missing_layout(self):
+        manifest = new_manifest()
+        self.generate(manifest)
+        self.write(
+            os.path.join(self.content, "blog", "index.md"),
+            "---\nlayout: missing\n---\n# Blog",
+        )
+        self.write(os.path.join(self.content, "index.md"), "# Welcome")
+        failures, _ = self.generate(manifest)
+        self.assertEqual(len(failures), 1)
+        self.assertTrue(failures[0][0].endswith("index.md"))
+        self.assertIn("missing.html does not exist", failures[0][1])
+        # The other pages are still generated and the earlier output is kept
+        self.assertIn("<h1>Welcome</h1>", self.output("index.html"))
+        self.assertIn("<h1>Blog</h1>", self.output("blog", "index.html"))
+        self.assertEqual(sorted(manifest["pages"]), ["index.html"])
+
+
+class TestBuild(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cwd = os.getcwd()
+        os.chdir(self.dir)
+        self.write("template.html", TEMPLATE)
+        self.write("content/index.md", "# Home\n\n[Blog](/blog)")
+        self.write("content/blog/index.md", "# Blog\n\n[Home](/)")
+        # Pages take precedence over static files with the same output path
+        self.write("static/index.html", "static page")
+        self.write("static/index.css", "body {}")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def build(self, *argv):
+        out, err = StringIO(), StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            failures = build(parse_args(["--no-cache", *argv]))
+        return failures, out.getvalue(), err.getvalue()
+
+    def test_include(self):
+        self.build()
+        self.write("content/blog/index.md", "# News\n\n[Home](/)")
+        failures, out, err = self.build("--include", "blog/*")
+        self.assertEqual(failures, [])
+        self.assertNotIn("Removed", out)
+        self.assertEqual(err, "")
+        # Outputs of files left out by the globs are kept as they were
+        self.assertIn("<h1>Home</h1>", self.read("docs/index.html"))
+        self.assertEqual(self.read("docs/index.css"), "body {}")
+        self.assertIn("<h1>News</h1>", self.read("docs/blog/index.html"))
+
+
+if __name__ == "__main__":
+    unittest.main()
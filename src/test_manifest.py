@@ -0,0 +1,66 @@
+import os
+import unittest
+
+from manifest import (
+    load_manifest,
+    save_manifest,
+    new_manifest,
+    file_fingerprint,
+    output_stat,
+    is_page_up_to_date,
+    prune_outputs,
+)
+from testcase import TempDirTestCase
+
+
+class TestManifest(TempDirTestCase):
+    def test_load_missing_or_corrupt(self):
+        self.assertEqual(load_manifest(self.dir), new_manifest())
+        self.write(".build-manifest.json", "{not json")
+        self.assertEqual(load_manifest(self.dir), new_manifest())
+
+    def test_save_and_load(self):
+        manifest = new_manifest()
+        manifest["pages"]["index.html"] = {"source_hash": "abc"}
+        save_manifest(self.dir, manifest)
+        self.assertEqual(load_manifest(self.dir), manifest)
+
+    def test_fingerprint_reuses_hash(self):
+        path = self.write("a.md", "# Hello")
+        first = file_fingerprint(path)
+        # A fake hash proves the file was not read again
+        cached = dict(first, hash="cached")
+        self.assertEqual(file_fingerprint(path, cached)["hash"], "cached")
+        self.write("a.md", "# Hello there")
+        self.assertNotEqual(file_fingerprint(path, cached)["hash"], "cached")
+
+    def test_page_up_to_date(self):
+        dest = self.write("index.html", "<p>hi</p>")
+        entry = {"source_hash": "s", "template_hash": "t", "basepath": "/"}
+        previous = dict(entry, output=output_stat(dest))
+        self.assertTrue(is_page_up_to_date(previous, entry, dest))
+        self.assertFalse(is_page_up_to_date(None, entry, dest))
+        self.assertFalse(
+            is_page_up_to_date(previous, dict(entry, basepath="/blog/"), dest)
+        )
+        self.assertFalse(
+            is_page_up_to_date(previous, dict(entry, template_hash="x"), dest)
+        )
+        os.remove(dest)
+        self.assertFalse(is_page_up_to_date(previous, entry, dest))
+
+    def test_prune_outputs(self):
+        self.write("index.html", "keep")
+        self.write("blog/old/index.html", "remove")
+        removed = prune_outputs(
+            {"index.html": {}, "blog/old/index.html": {}},
+            {"index.html": {}},
+            self.dir,
+        )
+        self.assertEqual(removed, ["blog/old/index.html"])
+        self.assertTrue(os.path.exists(os.path.join(self.dir, "index.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "blog")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,4 +1,5 @@
 import unittest
+from io import StringIO
 from markdown_formatting import (
     BlockType,
     extract_markdown_images,
@@ -7,6 +8,8 @@ from markdown_formatting import (
     block_to_block_type,
     markdown_to_html_node,
     extract_title,
+    parse_blocks,
+    MarkdownStream,
 )
 
 
@@ -190,6 +193,65 @@ class testMarkDownFormatting(unittest.TestCase):
             "<div><h1>This is first heading</h1><h2>This is second heading</h2><h5>This is even more heading</h5></div>",
         )
 
+    def test_parse_blocks(self):
+        lines = [
+            "# Heading",
+            "A paragraph",
+            "on two lines",
+            "- item one",
+            "continued",
+            "- item two",
+            "",
+            "",
+            "",
+            "1. first",
+            "2. second",
+            "> quoted",
+            "    ```",
+            "    def f():",
+            "",
+            "        return 1",
+            "    ```",
+            "```",
+            "if x:",
+            "    y()",
+            "```",
+            "## Another heading",
+        ]
+        self.assertEqual(
+            list(parse_blocks(lines)),
+            [
+                (BlockType.HEADING, ["# Heading"]),
+                (BlockType.PARAGRAPH, ["A paragraph", "on two lines"]),
+                (BlockType.UNORDERED_LIST, ["item one continued", "item two"]),
+                (BlockType.ORDERED_LIST, ["first", "second"]),
+                (BlockType.QUOTE, ["quoted"]),
+                (BlockType.CODE, ["def f():", "", "    return 1"]),
+                (BlockType.CODE, ["if x:", "    y()"]),
+                (BlockType.HEADING, ["## Another heading"]),
+            ],
+        )
+
+    def test_blocks_without_blank_lines(self):
+        md = """# Title
+Some text
+- a list
+2. not an item
+```
+code
+```"""
+        html = markdown_to_html_node(md).to_html()
+        self.assertEqual(
+            html,
+            "<div><h1>Title</h1><p>Some text</p><ul><li>a list 2. not an item</li></ul><pre><code>code\n</code></pre></div>",
+        )
+
+    def test_markdown_stream(self):
+        md = "# Title\n\nSome **text**\n\n- a\n- b\n\n```\ncode\n```\n"
+        writer = StringIO()
+        MarkdownStream(StringIO(md)).render_to(writer)
+        self.assertEqual(writer.getvalue(), markdown_to_html_node(md).to_html())
+
     def test_extract_title(self):
         md = """
         # This is a file with a header
@@ -0,0 +1,65 @@
+import unittest
+
+from metadata import (
+    parse_front_matter,
+    read_front_matter,
+    open_body,
+    page_metadata,
+    update_index,
+    query_index,
+)
+from testcase import TempDirTestCase
+
+
+class TestMetadata(TempDirTestCase):
+    def test_parse_front_matter(self):
+        self.assertEqual(
+            parse_front_matter(
+                ['title: "Tom: a Mistake"', "tags: [tolkien, lotr]", "draft: no", "x"]
+            ),
+            {"title": "Tom: a Mistake", "tags": ["tolkien", "lotr"], "draft": False},
+        )
+        self.assertEqual(parse_front_matter(["Draft: yes"]), {"draft": True})
+
+    def test_read_front_matter(self):
+        path = self.write("a.md", "---\ntitle: Café\n---\n# Heading\n")
+        meta, offset = read_front_matter(path)
+        self.assertEqual(meta, {"title": "Café"})
+        with open_body(path, offset) as f:
+            self.assertEqual(f.read(), "# Heading\n")
+
+    def test_no_front_matter(self):
+        self.assertEqual(read_front_matter(self.write("a.md", "# A\n---\n")), ({}, 0))
+        # Front matter that is never closed is part of the page
+        path = self.write("b.md", "---\ntitle: B\n")
+        self.assertEqual(read_front_matter(path), ({}, 0))
+
+    def test_page_metadata_reuse(self):
+        path = self.write("a.md", "---\ntitle: A\n---\n")
+        entry = page_metadata(path)
+        stale = {**entry, "meta": {"title": "Stale"}}
+        # An unchanged file is not read again
+        self.assertIs(page_metadata(path, stale), stale)
+        self.write("a.md", "---\ntitle: Changed\n---\n")
+        self.assertEqual(page_metadata(path, stale)["meta"], {"title": "Changed"})
+
+    def test_query_index(self):
+        self.write("a.md", "---\ndate: 2024-01-05\ntags: tolkien\n---\n")
+        self.write("blog/b.md", "---\ndate: 2023-06-01\ntags: tolkien, lotr\n---\n")
+        self.write("c.md", "---\ndate: 2024-02-01\ndraft: true\n---\n")
+        self.write("d.txt", "---\ndate: 2024-02-01\n---\n")
+        index = update_index(self.dir, {})
+        self.assertEqual(sorted(index), ["a.md", "blog/b.md", "c.md"])
+
+        def paths(**query):
+            return [rel_path for rel_path, _ in query_index(index, **query)]
+
+        self.assertEqual(paths(), ["blog/b.md", "a.md", "c.md"])
+        self.assertEqual(paths(tag="tolkien"), ["blog/b.md", "a.md"])
+        self.assertEqual(paths(drafts=True), ["c.md"])
+        self.assertEqual(paths(drafts=False, since="2024-01-01"), ["a.md"])
+        self.assertEqual(paths(until="2023-12-31"), ["blog/b.md"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import zlib
+import unittest
+from unittest import mock
+
+import optimize
+from optimize import (
+    optimize_png,
+    read_png_chunks,
+    png_chunk,
+    minify_css,
+    optimize_asset,
+    PNG_SIGNATURE,
+)
+from testcase import TempDirTestCase
+
+
+# Returns a 64x64 grayscale PNG stored without compression
+def make_png(*extra_chunks):
+    rows = b"".join(b"\0" + bytes(range(64)) for _ in range(64))
+    return b"".join(
+        [
+            PNG_SIGNATURE,
+            png_chunk(b"IHDR", (64).to_bytes(4, "big") * 2 + b"\x08\0\0\0\0"),
+            *extra_chunks,
+            png_chunk(b"IDAT", zlib.compress(rows, 0)[:100]),
+            png_chunk(b"IDAT", zlib.compress(rows, 0)[100:]),
+            png_chunk(b"IEND", b""),
+        ]
+    )
+
+
+class TestOptimizePng(unittest.TestCase):
+    def test_recompresses_and_strips_chunks(self):
+        data = make_png(
+            png_chunk(b"tEXt", b"Comment\0hello"), png_chunk(b"tRNS", b"\0\0")
+        )
+        optimized = optimize_png(data)
+        self.assertLess(len(optimized), len(data))
+        chunks = read_png_chunks(optimized)
+        chunk_types = [chunk_type for chunk_type, _ in chunks]
+        self.assertEqual(chunk_types, [b"IHDR", b"tRNS", b"IDAT", b"IEND"])
+        image = b"".join(chunk_data for _, chunk_data in read_png_chunks(data)[3:5])
+        self.assertEqual(zlib.decompress(chunks[2][1]), zlib.decompress(image))
+
+    def test_leaves_unsupported_files_alone(self):
+        self.assertEqual(optimize_png(b"not a png"), b"not a png")
+        broken = make_png()[:-5]
+        self.assertEqual(optimize_png(broken), broken)
+        animated = make_png(png_chunk(b"acTL", b"\0" * 8))
+        self.assertEqual(optimize_png(animated), animated)
+
+
+class TestMinifyCss(unittest.TestCase):
+    def test_minify(self):
+        css = """/* Headings */
+h1,
+h2 > a :hover {
+  color: #dda15e;
+  font-family: "Luminari",  "Georgia", serif;
+}
+"""
+        self.assertEqual(
+            minify_css(css),
+            'h1,h2>a :hover{color:#dda15e;font-family:"Luminari","Georgia",serif}',
+        )
+
+    def test_strings_are_kept(self):
+        css = 'a::after { content: "a ;  } /* b */" ; }'
+        self.assertEqual(minify_css(css), 'a::after{content:"a ;  } /* b */"}')
+
+
+class TestOptimizeAsset(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = self.write("index.css", "body {\n  margin: 0;\n}\n")
+        self.cache = os.path.join(self.dir, "cache")
+
+    def test_cached_result(self):
+        dest = os.path.join(self.dir, "a.css")
+        self.assertEqual(optimize_asset((self.src, dest, self.cache)), (22, 14))
+        # The same input is copied from the cache instead of being optimized again
+        dest = os.path.join(self.dir, "b.css")
+        with mock.patch.dict(optimize.OPTIMIZERS, {".css": None}):
+            self.assertEqual(optimize_asset((self.src, dest, self.cache)), (22, 14))
+        with open(dest) as f:
+            self.assertEqual(f.read(), "body{margin:0}")
+
+
+if __name__ == "__main__":
+    unittest.main()
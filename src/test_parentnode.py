@@ -1,4 +1,5 @@
 import unittest
+from io import StringIO
 
 from parentnode import ParentNode
 from leafnode import LeafNode
@@ -48,6 +49,26 @@ class TestParentNode(unittest.TestCase):
             "ParentNode must have at least one child" in str(context.exception)
         )
 
+    def test_render_to(self):
+        node = ParentNode(
+            "ul",
+            [
+                ParentNode("li", [LeafNode("b", "one")]),
+                ParentNode("li", [LeafNode(None, "two")]),
+            ],
+        )
+        writer = StringIO()
+        node.render_to(writer)
+        self.assertEqual(writer.getvalue(), "<ul><li><b>one</b></li><li>two</li></ul>")
+
+    def test_render_deeply_nested(self):
+        node = LeafNode(None, "deep")
+        for _ in range(10000):
+            node = ParentNode("span", [node])
+        html = node.to_html()
+        self.assertTrue(html.startswith("<span><span>"))
+        self.assertEqual(len(html), 10000 * len("<span></span>") + len("deep"))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+from pipeline import run_pipeline
+
+
+class TestPipeline(unittest.TestCase):
+    def test_order_and_threads(self):
+        written = []
+        threads = set()
+
+        def read(item):
+            threads.add(("read", threading.get_ident()))
+            return item * 2
+
+        def process(item, value):
+            threads.add(("process", threading.get_ident()))
+            return value + 1
+
+        def write(item, value):
+            threads.add(("write", threading.get_ident()))
+            written.append((item, value))
+
+        errors = run_pipeline(range(100), read, process, write, depth=2)
+        self.assertEqual(errors, [None] * 100)
+        self.assertEqual(written, [(i, i * 2 + 1) for i in range(100)])
+        self.assertEqual(len({ident for _, ident in threads}), 3)
+        self.assertIn(("process", threading.get_ident()), threads)
+
+    def test_errors_skip_later_stages(self):
+        written = []
+
+        def read(item):
+            if item == 1:
+                raise OSError("unreadable")
+            return item
+
+        def process(item, value):
+            if item == 2:
+                raise ValueError("Delimiter is not paired")
+            return value
+
+        def write(item, value):
+            if item == 3:
+                raise OSError("disk full")
+            written.append(item)
+
+        errors = run_pipeline(range(5), read, process, write)
+        self.assertIsNone(errors[0])
+        self.assertIn("unreadable", errors[1])
+        self.assertIn("Delimiter is not paired", errors[2])
+        self.assertIn("disk full", errors[3])
+        self.assertEqual(written, [0, 4])
+
+    def test_reads_are_bounded(self):
+        read_count = 0
+        ahead = []
+
+        def read(item):
+            nonlocal read_count
+            read_count += 1
+            return item
+
+        def process(item, value):
+            ahead.append(read_count - item)
+            return value
+
+        run_pipeline(range(50), read, process, lambda item, value: None, depth=3)
+        # The reader can hold one more item than fits in the queue
+        self.assertLessEqual(max(ahead), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
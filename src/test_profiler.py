@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from profiler import Profiler, NULL_PROFILER, NULL_STAGE
+
+
+class TestProfiler(unittest.TestCase):
+    def test_stages_and_pages(self):
+        profiler = Profiler()
+        counters = {}
+        with profiler.stage("page", "a.md", counters):
+            with profiler.stage("read", "a.md"):
+                pass
+            counters["blocks"] = 3
+        with profiler.stage("page", "b.md", {"blocks": 1}):
+            sum(range(100000))
+
+        totals = profiler.stage_totals()
+        self.assertEqual(list(totals), ["read"])
+        self.assertEqual(totals["read"][0], 1)
+        slowest = profiler.slowest_pages()
+        self.assertEqual([e["args"]["page"] for e in slowest], ["b.md", "a.md"])
+        self.assertEqual(slowest[1]["args"]["blocks"], 3)
+
+        other = Profiler()
+        with other.stage("read", "c.md"):
+            pass
+        profiler.merge(other.events)
+        self.assertEqual(profiler.stage_totals()["read"][0], 2)
+
+    def test_thread_cpu_time(self):
+        profiler = Profiler()
+        busy = threading.Thread(target=lambda: sum(range(3000000)))
+        # CPU used by other threads while a stage waits is not counted for it
+        with profiler.stage("write"):
+            busy.start()
+            busy.join()
+        with profiler.stage("render"):
+            sum(range(3000000))
+        totals = profiler.stage_totals()
+        self.assertLess(totals["write"][2], totals["render"][2] / 2)
+
+    def test_write_trace(self):
+        profiler = Profiler()
+        with profiler.stage("static"):
+            pass
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            profiler.write_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        event = trace["traceEvents"][0]
+        self.assertEqual((event["name"], event["ph"]), ("static", "X"))
+
+    def test_null_profiler(self):
+        self.assertFalse(NULL_PROFILER.enabled)
+        self.assertIs(NULL_PROFILER.stage("read", "a.md"), NULL_STAGE)
+        with NULL_PROFILER.stage("read"):
+            pass
+        NULL_PROFILER.merge([{"name": "read"}])
+        self.assertEqual(len(NULL_PROFILER.events), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+import gzip
+import threading
+import unittest
+from http.client import HTTPConnection
+
+from manifest import new_manifest, save_manifest, output_stat
+from serve import (
+    SiteCache,
+    start_server,
+    accepts_gzip,
+    etag_matches,
+    inject_reload_script,
+    ReloadNotifier,
+    RELOAD_SCRIPT,
+)
+from testcase import TempDirTestCase
+
+PAGE = b"<html><body>" + b"<p>Tom Bombadil</p>" * 50 + b"</body></html>"
+
+
+class TestServe(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dest = self.dir
+        self.manifest = new_manifest()
+        self.write("index.html", PAGE)
+        self.write(os.path.join("blog", "index.html"), b"<p>Blog</p>")
+        self.write("tom.1234abcd.png", b"\x89PNG")
+        self.manifest["pages"] = {
+            "index.html": {},
+            os.path.join("blog", "index.html"): {},
+        }
+        self.manifest["assets"] = {"tom.png": {"path": "tom.1234abcd.png"}}
+        save_manifest(self.dest, self.manifest)
+
+    def serve(self, site):
+        server = start_server(site, 0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.port = server.server_port
+
+    def request(self, url, **headers):
+        connection = HTTPConnection("localhost", self.port)
+        connection.request("GET", url, headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        return response, body
+
+    def test_accepts_gzip(self):
+        self.assertTrue(accepts_gzip("gzip, deflate, br"))
+        self.assertTrue(accepts_gzip("br;q=1.0, gzip;q=0.8"))
+        self.assertTrue(accepts_gzip("*"))
+        self.assertFalse(accepts_gzip("gzip;q=0, br"))
+        self.assertFalse(accepts_gzip("identity"))
+        self.assertFalse(accepts_gzip(""))
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"a", "b"', '"b"'))
+        self.assertTrue(etag_matches('W/"b"', '"b"'))
+        self.assertTrue(etag_matches("*", '"b"'))
+        self.assertFalse(etag_matches("", '"b"'))
+
+    def test_routes(self):
+        site = SiteCache(self.dest)
+        self.assertEqual(
+            sorted(site.routes),
+            [
+                "/",
+                "/blog",
+                "/blog/",
+                "/blog/index.html",
+                "/index.html",
+                "/tom.1234abcd.png",
+            ],
+        )
+        self.assertIs(site.routes["/"], site.routes["/index.html"])
+        self.assertEqual(site.routes["/tom.1234abcd.png"].content_type, "image/png")
+        self.assertEqual(gzip.decompress(site.routes["/"].gzip), PAGE)
+        # The tiny blog page is not worth compressing
+        self.assertIsNone(site.routes["/blog/"].gzip)
+
+    def test_refresh(self):
+        site = SiteCache(self.dest)
+        self.assertEqual(site.refresh(), 0)
+        self.write(os.path.join("blog", "index.html"), b"<p>New</p>")
+        self.assertEqual(site.refresh(), 1)
+        self.assertEqual(site.routes["/blog/"].body, b"<p>New</p>")
+
+        # Outputs that are no longer in the manifest are no longer served
+        del self.manifest["pages"]["index.html"]
+        save_manifest(self.dest, self.manifest)
+        site.refresh()
+        self.assertNotIn("/", site.routes)
+
+    def test_refresh_written(self):
+        site = SiteCache(self.dest)
+        self.write("index.html", b"<p>On disk</p>")
+        self.write(os.path.join("blog", "index.html"), b"<p>Blog on disk</p>")
+        # Contents given by the build are used as they are, outputs mapped to None are
+        # read and outputs that are not listed are not checked
+        written = {"index.html": b"<p>Rendered</p>", "tom.1234abcd.png": None}
+        self.write("tom.1234abcd.png", b"new png")
+        self.assertEqual(site.refresh(written), 2)
+        self.assertEqual(site.routes["/"].body, b"<p>Rendered</p>")
+        self.assertEqual(site.routes["/tom.1234abcd.png"].body, b"new png")
+        self.assertEqual(site.routes["/blog/"].body, b"<p>Blog</p>")
+
+    def test_precompressed(self):
+        self.write("index.html.gz", b"sibling")
+        path = os.path.join(self.dest, "index.html")
+        self.manifest["compressed"] = {
+            "index.html": {"output": output_stat(path), "gz": output_stat(path + ".gz")}
+        }
+        save_manifest(self.dest, self.manifest)
+        # The sibling written by the build is served instead of compressing again
+        self.assertEqual(SiteCache(self.dest).routes["/"].gzip, b"sibling")
+        # Pages with the reload script do not use the sibling
+        site = SiteCache(self.dest, inject_reload_script)
+        self.assertIn(RELOAD_SCRIPT.encode(), gzip.decompress(site.routes["/"].gzip))
+
+    def test_conditional_get(self):
+        site = SiteCache(self.dest)
+        self.serve(site)
+        response, body = self.request("/")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, PAGE)
+        self.assertEqual(response.getheader("Content-Type"), "text/html; charset=utf-8")
+        etag = response.getheader("ETag")
+
+        response, body = self.request("/index.html", **{"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+
+        self.write("index.html", b"<p>Changed</p>")
+        site.refresh()
+        response, body = self.request("/", **{"If-None-Match": etag})
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, b"<p>Changed</p>")
+
+    def test_gzip(self):
+        site = SiteCache(self.dest)
+        self.serve(site)
+        response, body = self.request("/", **{"Accept-Encoding": "gzip"})
+        self.assertEqual(response.getheader("Content-Encoding"), "gzip")
+        self.assertEqual(response.getheader("Vary"), "Accept-Encoding")
+        self.assertEqual(gzip.decompress(body), PAGE)
+        # The compressed variant has its own ETag
+        etag = response.getheader("ETag")
+        self.assertNotEqual(etag, site.routes["/"].etag)
+        headers = {"Accept-Encoding": "gzip", "If-None-Match": etag}
+        response, _ = self.request("/", **headers)
+        self.assertEqual(response.status, 304)
+
+    def test_redirect_and_missing(self):
+        site = SiteCache(self.dest)
+        self.serve(site)
+        response, _ = self.request("/blog?page=2")
+        self.assertEqual(response.status, 301)
+        self.assertEqual(response.getheader("Location"), "/blog/?page=2")
+        response, _ = self.request("/missing")
+        self.assertEqual(response.status, 404)
+
+    def test_inject_reload_script(self):
+        html = b"<html><body><p>hi</p></body></html>"
+        self.assertEqual(
+            inject_reload_script(html),
+            b"<html><body><p>hi</p>" + RELOAD_SCRIPT.encode() + b"</body></html>",
+        )
+        self.assertTrue(inject_reload_script(b"<p>hi</p>").endswith(b"</script>"))
+
+    def test_reload_notifier(self):
+        notifier = ReloadNotifier()
+        self.assertEqual(notifier.wait(0, timeout=0.01), 0)
+        threading.Timer(0.01, notifier.notify).start()
+        self.assertEqual(notifier.wait(0, timeout=5), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import argparse
+import unittest
+from contextlib import redirect_stdout, redirect_stderr
+from io import StringIO
+
+from main import build, parse_args
+from manifest import load_manifest
+from shards import parse_shard, in_shard, merge_shards
+from testcase import TempDirTestCase
+
+
+class TestShards(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cwd = os.getcwd()
+        os.chdir(self.dir)
+        self.write("template.html", "<title>{{ Title }}</title>{{ Content }}")
+        for i in range(8):
+            self.write(f"content/page{i}.md", f"# Page {i}\n\n[Next](/page{i + 1})")
+            self.write(f"static/images/{i}.txt", f"image {i}")
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+
+    def build(self, *argv):
+        with redirect_stdout(StringIO()), redirect_stderr(StringIO()):
+            return build(parse_args(["--no-cache", *argv]))
+
+    def merge(self, shard_dirs):
+        with redirect_stdout(StringIO()):
+            return merge_shards(shard_dirs, "docs")
+
+    def outputs(self, path):
+        files = {}
+        for root, _, names in os.walk(path):
+            for name in names:
+                file_path = os.path.join(root, name)
+                with open(file_path, "rb") as f:
+                    files[os.path.relpath(file_path, path)] = f.read()
+        # The manifests differ in the output mtimes
+        del files[".build-manifest.json"]
+        return files
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ("0/4", "5/4", "2", "a/b"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(value)
+
+    def test_in_shard(self):
+        paths = [f"blog/{i}.md" for i in range(100)]
+        shards = [[path for path in paths if in_shard(path, (i, 3))] for i in (1, 2, 3)]
+        # Every path is in exactly one shard, and the shards are roughly balanced
+        self.assertEqual(sorted(sum(shards, [])), sorted(paths))
+        self.assertTrue(all(len(shard) > 15 for shard in shards))
+
+    def test_merge(self):
+        self.build()
+        expected = self.outputs("docs")
+        manifest = load_manifest("docs")
+
+        self.build("--shard", "1/2")
+        self.build("--shard", "2/2")
+        shard_pages = [load_manifest(f"docs.shards/{i}-of-2")["pages"] for i in (1, 2)]
+        self.assertTrue(all(shard_pages))
+        self.assertFalse(set(shard_pages[0]) & set(shard_pages[1]))
+
+        os.remove("docs/page0.html")
+        self.assertEqual(self.merge(["docs.shards/2-of-2", "docs.shards/1-of-2"]), [])
+        merged = load_manifest("docs")
+        self.assertEqual(self.outputs("docs"), expected)
+        self.assertEqual(merged["pages"].keys(), manifest["pages"].keys())
+        self.assertNotIn("shard", merged)
+        # The merged output can be built on incrementally
+        self.assertEqual(self.build(), [])
+        self.assertEqual(load_manifest("docs")["pages"], merged["pages"])
+
+    def test_merge_checks(self):
+        self.build("--shard", "1/2", "--fingerprint-assets")
+        self.build("--shard", "2/2", "--fingerprint-assets")
+        with self.assertRaises(ValueError):
+            self.merge(["docs.shards/1-of-2"])
+        with self.assertRaises(ValueError):
+            self.merge(["docs.shards/1-of-2", "docs.shards/1-of-2"])
+
+        # Assets synced by both shards are not conflicts unless they differ
+        shards = ["docs.shards/1-of-2", "docs.shards/2-of-2"]
+        self.assertEqual(self.merge(shards), [])
+        manifest = load_manifest("docs.shards/2-of-2")
+        fingerprinted = manifest["assets"]["images/0.txt"]["path"]
+        self.write(os.path.join(shards[1], fingerprinted), "x")
+        self.assertEqual(self.merge(shards), [(fingerprinted, shards)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import unittest
+
+from staging import builds_dir, link_tree, prepare_staging, publish
+from testcase import TempDirTestCase
+
+
+class TestStaging(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.live = os.path.join(self.dir, "docs")
+
+    def test_link_tree(self):
+        src = os.path.join(self.dir, "src")
+        self.write(os.path.join(src, "blog", "index.html"), "blog")
+        dest = os.path.join(self.dir, "dest")
+        link_tree(src, dest)
+        self.assertTrue(
+            os.path.samefile(
+                os.path.join(src, "blog", "index.html"),
+                os.path.join(dest, "blog", "index.html"),
+            )
+        )
+
+    def test_publish(self):
+        # The first staged build replaces an existing output directory
+        self.write(os.path.join(self.live, "index.html"), "old")
+        first = prepare_staging(self.live)
+        self.assertEqual(self.read(os.path.join(first, "index.html")), "old")
+        self.write(os.path.join(first, "new.html"), "new")
+        publish(self.live, first)
+        self.assertTrue(os.path.islink(self.live))
+        self.assertEqual(self.read(os.path.join(self.live, "new.html")), "new")
+
+        # Replacing a file in the staging directory leaves the live build alone
+        second = prepare_staging(self.live)
+        os.remove(os.path.join(second, "index.html"))
+        self.write(os.path.join(second, "index.html"), "changed")
+        self.assertEqual(self.read(os.path.join(self.live, "index.html")), "old")
+        publish(self.live, second)
+        self.assertEqual(self.read(os.path.join(self.live, "index.html")), "changed")
+
+        # Only the live build and the one before it are kept
+        third = prepare_staging(self.live)
+        publish(self.live, third)
+        self.assertEqual(
+            sorted(os.listdir(builds_dir(self.live))),
+            sorted([os.path.basename(second), os.path.basename(third)]),
+        )
+
+    def test_clean(self):
+        self.write(os.path.join(self.live, "index.html"), "old")
+        staging = prepare_staging(self.live, clean=True)
+        self.assertEqual(os.listdir(staging), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import unittest
+from contextlib import redirect_stdout
+from io import StringIO
+
+from manifest import new_manifest
+from sync import sync_directory, copy_file, load_asset_map
+from discover import scan_tree
+from optimize import AssetOptimizer
+from testcase import TempDirTestCase
+
+
+class TestSync(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.src = os.path.join(self.dir, "static")
+        self.dest = os.path.join(self.dir, "docs")
+        self.manifest = new_manifest()
+
+    def test_copies_only_changed_files(self):
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        self.write(os.path.join(self.src, "images", "a.png"), "png")
+        sync_directory(self.src, self.dest, self.manifest)
+        self.assertEqual(self.read(os.path.join(self.dest, "images", "a.png")), "png")
+
+        # Unchanged files are left alone, even if their output was modified
+        # outside the build the change is detected
+        dest_css = os.path.join(self.dest, "index.css")
+        inode = os.stat(dest_css).st_ino
+        sync_directory(self.src, self.dest, self.manifest)
+        self.assertEqual(os.stat(dest_css).st_ino, inode)
+
+        self.write(dest_css, "tampered")
+        sync_directory(self.src, self.dest, self.manifest)
+        self.assertEqual(self.read(dest_css), "body {}")
+
+    def test_prunes_removed_files(self):
+        self.write(os.path.join(self.src, "images", "a.png"), "png")
+        self.write(os.path.join(self.dest, "index.html"), "generated page")
+        sync_directory(self.src, self.dest, self.manifest)
+        os.remove(os.path.join(self.src, "images", "a.png"))
+        sync_directory(self.src, self.dest, self.manifest)
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "images")))
+        # Files not created by the sync are kept
+        self.assertTrue(os.path.exists(os.path.join(self.dest, "index.html")))
+
+    def test_filtered_files_are_kept(self):
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        self.write(os.path.join(self.src, "images", "a.png"), "png")
+        sync_directory(self.src, self.dest, self.manifest)
+        files = scan_tree(self.src, include=["images/*"])
+        sync_directory(self.src, self.dest, self.manifest, files=files)
+        self.assertEqual(self.read(os.path.join(self.dest, "index.css")), "body {}")
+        self.assertEqual(sorted(self.manifest["assets"]), ["images/a.png", "index.css"])
+
+    def test_exclude(self):
+        self.write(os.path.join(self.src, "index.html"), "static page")
+        self.write(os.path.join(self.dest, "index.html"), "generated page")
+        sync_directory(self.src, self.dest, self.manifest, exclude={"index.html"})
+        self.assertEqual(
+            self.read(os.path.join(self.dest, "index.html")), "generated page"
+        )
+
+    def test_checksum_skips_touched_files(self):
+        src_css = os.path.join(self.src, "index.css")
+        self.write(src_css, "body {}")
+        sync_directory(self.src, self.dest, self.manifest, checksum=True)
+        dest_css = os.path.join(self.dest, "index.css")
+        inode = os.stat(dest_css).st_ino
+        os.utime(src_css, ns=(0, 0))
+        sync_directory(self.src, self.dest, self.manifest, checksum=True)
+        self.assertEqual(os.stat(dest_css).st_ino, inode)
+
+    def test_checksum_after_plain_sync(self):
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        sync_directory(self.src, self.dest, self.manifest)
+        # Entries synced without checksums have no hash yet
+        sync_directory(self.src, self.dest, self.manifest, checksum=True)
+        self.assertIn("hash", self.manifest["assets"]["index.css"]["source"])
+        # The hash is kept by a sync without checksums
+        sync_directory(self.src, self.dest, self.manifest)
+        out = StringIO()
+        with redirect_stdout(out):
+            sync_directory(self.src, self.dest, self.manifest, checksum=True)
+        self.assertIn("0 copied", out.getvalue())
+
+    def test_optimizer(self):
+        self.write(os.path.join(self.src, "index.css"), "body {\n  margin: 0;\n}\n")
+        self.write(os.path.join(self.src, "notes.txt"), "text  ")
+        dest_css = os.path.join(self.dest, "index.css")
+        optimizer = AssetOptimizer()
+        sync_directory(self.src, self.dest, self.manifest, optimizer=optimizer)
+        self.assertEqual(self.read(dest_css), "body{margin:0}")
+        self.assertEqual(self.read(os.path.join(self.dest, "notes.txt")), "text  ")
+
+        inode = os.stat(dest_css).st_ino
+        sync_directory(self.src, self.dest, self.manifest, optimizer=optimizer)
+        self.assertEqual(os.stat(dest_css).st_ino, inode)
+        # Turning the optimizer off copies the original again
+        sync_directory(self.src, self.dest, self.manifest)
+        self.assertEqual(self.read(dest_css), "body {\n  margin: 0;\n}\n")
+
+    def test_fingerprint(self):
+        self.write(os.path.join(self.src, "index.css"), "body {}")
+        self.write(os.path.join(self.src, "index.html"), "page")
+        sync_directory(self.src, self.dest, self.manifest, fingerprint=True)
+        urls = load_asset_map(self.manifest).urls
+        self.assertEqual(list(urls), ["/index.css"])
+        self.assertRegex(urls["/index.css"], r"^/index\.[0-9a-f]{8}\.css$")
+        self.assertEqual(self.read(self.dest + urls["/index.css"]), "body {}")
+        self.assertEqual(self.read(os.path.join(self.dest, "index.html")), "page")
+        self.assertFalse(os.path.exists(os.path.join(self.dest, "index.css")))
+
+        # A changed file gets a new name and the old one is removed
+        self.write(os.path.join(self.src, "index.css"), "body { margin: 0 }")
+        os.utime(os.path.join(self.src, "index.css"), ns=(0, 0))
+        sync_directory(self.src, self.dest, self.manifest, fingerprint=True)
+        new_urls = load_asset_map(self.manifest).urls
+        self.assertNotEqual(new_urls["/index.css"], urls["/index.css"])
+        self.assertFalse(os.path.exists(self.dest + urls["/index.css"]))
+
+    def test_hardlink_copy(self):
+        src_css = os.path.join(self.src, "index.css")
+        self.write(src_css, "body {}")
+        os.makedirs(self.dest)
+        dest_css = os.path.join(self.dest, "index.css")
+        self.write(dest_css, "old")
+        copy_file(src_css, dest_css, hardlink=True)
+        self.assertEqual(self.read(dest_css), "body {}")
+
+
+if __name__ == "__main__":
+    unittest.main()
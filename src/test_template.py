@@ -0,0 +1,134 @@
+import os
+import unittest
+from io import StringIO
+
+from leafnode import LeafNode
+from parentnode import ParentNode
+from urls import UrlRewriter
+
+from template import (
+    compile_template,
+    load_template,
+    minify_html,
+    clear_template_cache,
+    LayoutResolver,
+)
+from testcase import TempDirTestCase
+
+
+class TestTemplate(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        clear_template_cache()
+
+    def tearDown(self):
+        clear_template_cache()
+
+    def test_compile_and_render(self):
+        path = self.write(
+            "template.html", "<title>{{ Title }}</title><p>{{Content}}</p>{{ Footer }}"
+        )
+        template = compile_template(path)
+        self.assertEqual(
+            template.segments, ["<title>", "", "</title><p>", "", "</p>", "", ""]
+        )
+        self.assertEqual(template.slots, [(1, "Title"), (3, "Content"), (5, "Footer")])
+        self.assertEqual(
+            template.render({"Title": "Hi", "Content": "text"}),
+            "<title>Hi</title><p>text</p>",
+        )
+
+    def test_render_to(self):
+        path = self.write("template.html", "<title>{{ Title }}</title>{{ Content }}!")
+        writer = StringIO()
+        content = ParentNode("p", [LeafNode(None, "streamed")])
+        compile_template(path).render_to(writer, {"Title": "Hi", "Content": content})
+        self.assertEqual(writer.getvalue(), "<title>Hi</title><p>streamed</p>!")
+
+    def test_url_rewriting(self):
+        path = self.write("template.html", '<link href="/index.css" />{{ Content }}')
+        template = load_template(path, UrlRewriter("/site/"))
+        self.assertEqual(template.segments[0], '<link href="/site/index.css" />')
+        # Templates are cached per URL rewriting
+        self.assertIsNot(load_template(path, UrlRewriter("/", 1)), template)
+        self.assertIs(load_template(path, UrlRewriter("/site/")), template)
+
+    def test_includes(self):
+        self.write("partials/nav.html", '<nav>{% include "links.html" %}</nav>')
+        self.write("partials/links.html", "<a>{{ Title }}</a>")
+        path = self.write(
+            "template.html", '<body>{% include "partials/nav.html" %}</body>'
+        )
+        template = compile_template(path)
+        self.assertEqual(
+            template.render({"Title": "Home"}), "<body><nav><a>Home</a></nav></body>"
+        )
+
+        # Editing an included file changes the template hash
+        before = template.hash
+        self.write("partials/links.html", "<a>{{ Title }}!</a>")
+        self.assertNotEqual(compile_template(path).hash, before)
+
+        self.write("loop.html", '{% include "loop.html" %}')
+        with self.assertRaises(ValueError):
+            compile_template(os.path.join(self.dir, "loop.html"))
+
+    def test_load_template_is_cached(self):
+        path = self.write("template.html", "{{ Content }}")
+        template = load_template(path)
+        self.write("template.html", "changed {{ Content }}")
+        self.assertIs(load_template(path), template)
+        clear_template_cache()
+        self.assertEqual(load_template(path).render({"Content": "x"}), "changed x")
+
+    def test_minify_html(self):
+        self.assertEqual(
+            minify_html("<ul>\n  <li>a  b</li>\n  <!-- note -->\n</ul> <b>c</b>\n"),
+            "<ul><li>a b</li></ul> <b>c</b>",
+        )
+        html = (
+            "<div>\n  <pre>\n  keep   this\n</pre>\n"
+            "<script>\nlet a = 1\n</script></div>"
+        )
+        self.assertEqual(
+            minify_html(html),
+            "<div><pre>\n  keep   this\n</pre><script>\nlet a = 1\n</script></div>",
+        )
+
+    def test_minify_keeps_rendered_whitespace(self):
+        # Line breaks next to text or between inline elements render as a space
+        self.assertEqual(minify_html("<p>a b\n<b>c</b></p>"), "<p>a b <b>c</b></p>")
+        self.assertEqual(
+            minify_html("<p>\n  <a>x</a>\n  <a>y</a>\n</p>"),
+            "<p><a>x</a> <a>y</a></p>",
+        )
+        path = self.write("template.html", "<div>\n  <h1>Welcome to\n  {{ Title }}</h1>")
+        template = load_template(path, minify=True)
+        self.assertEqual(template.render({"Title": "Hi"}), "<div><h1>Welcome to Hi</h1>")
+
+    def test_minify_template(self):
+        path = self.write(
+            "template.html",
+            "<html>\n  <title>{{ Title }}</title>\n"
+            "  <pre>\n{{ Content }}\n</pre>\n</html>\n",
+        )
+        template = load_template(path, minify=True)
+        self.assertEqual(
+            template.render({"Title": "Hi", "Content": "x  y"}),
+            "<html><title>Hi</title><pre>\nx  y\n</pre></html>",
+        )
+        self.assertIsNot(load_template(path), template)
+
+    def test_layout_resolver(self):
+        default = self.write("template.html", "")
+        layouts_dir = os.path.join(self.dir, "layouts")
+        blog = self.write("layouts/blog.html", "")
+        tom = self.write("layouts/blog/tom/index.html", "")
+        resolver = LayoutResolver(layouts_dir, default)
+        self.assertEqual(resolver.resolve("index.md"), default)
+        self.assertEqual(resolver.resolve("blog/majesty/index.md"), blog)
+        self.assertEqual(resolver.resolve("blog/tom/index.md"), tom)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -60,6 +60,20 @@ class TestTextNode(unittest.TestCase):
         )
         self.assertEqual(html_node6.value, "")
 
+    def test_node_renders_directly(self):
+        nodes = [
+            TextNode("text", TextType.TEXT),
+            TextNode("bold", TextType.BOLD),
+            TextNode("italic", TextType.ITALIC),
+            TextNode("code", TextType.CODE),
+            TextNode("link", TextType.LINK, "https://localhost:8080"),
+            TextNode("image", TextType.IMAGE, "/path/to/image"),
+            TextNode("x", TextType.BOLD, None, [TextNode("x", TextType.ITALIC)]),
+        ]
+        for node in nodes:
+            self.assertEqual(node.to_html(), text_node_to_html_node(node).to_html())
+        self.assertFalse(hasattr(nodes[0], "__dict__"))
+
     def test_split_delimited_nodes(self):
         node = TextNode("This is text with a `code block` word", TextType.TEXT)
         new_nodes = split_nodes_delimiter([node], "`", TextType.CODE)
@@ -157,6 +171,54 @@ class TestTextNode(unittest.TestCase):
             nodes,
         )
 
+    def test_text_to_nodes_nested(self):
+        nodes = text_to_textnodes("A **_bold italic_** and **bold with `code`**")
+        self.assertListEqual(
+            [
+                TextNode("A ", TextType.TEXT),
+                TextNode(
+                    "bold italic",
+                    TextType.BOLD,
+                    None,
+                    [TextNode("bold italic", TextType.ITALIC)],
+                ),
+                TextNode(" and ", TextType.TEXT),
+                TextNode(
+                    "bold with code",
+                    TextType.BOLD,
+                    None,
+                    [
+                        TextNode("bold with ", TextType.TEXT),
+                        TextNode("code", TextType.CODE),
+                    ],
+                ),
+            ],
+            nodes,
+        )
+        html_node = text_node_to_html_node(nodes[1])
+        self.assertEqual(html_node.to_html(), "<b><i>bold italic</i></b>")
+
+    def test_text_to_nodes_literal_spans(self):
+        # Markup characters inside code spans and link targets are not delimiters
+        nodes = text_to_textnodes(
+            "Run `a_b**c` or see [docs](https://x.dev/a_b_c) [not a link] !"
+        )
+        self.assertListEqual(
+            [
+                TextNode("Run ", TextType.TEXT),
+                TextNode("a_b**c", TextType.CODE),
+                TextNode(" or see ", TextType.TEXT),
+                TextNode("docs", TextType.LINK, "https://x.dev/a_b_c"),
+                TextNode(" [not a link] !", TextType.TEXT),
+            ],
+            nodes,
+        )
+
+    def test_text_to_nodes_unpaired(self):
+        for text in ["**bold", "_italic", "`code", "**crossed _spans** here_"]:
+            with self.assertRaises(ValueError):
+                text_to_textnodes(text)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from urls import UrlRewriter, AssetMap
+from markdown_formatting import markdown_to_html_node
+
+
+class TestUrls(unittest.TestCase):
+    def test_basepath(self):
+        rewriter = UrlRewriter("/site/")
+        self.assertEqual(rewriter.rewrite("/images/a.png"), "/site/images/a.png")
+        self.assertEqual(rewriter.rewrite("/"), "/site/")
+        self.assertEqual(rewriter.rewrite("https://boot.dev/"), "https://boot.dev/")
+        self.assertEqual(rewriter.rewrite("//cdn.dev/a.js"), "//cdn.dev/a.js")
+        self.assertEqual(rewriter.rewrite("#top"), "#top")
+
+    def test_relative(self):
+        self.assertEqual(
+            UrlRewriter("/", 2).rewrite("/images/a.png"), "../../images/a.png"
+        )
+        self.assertEqual(UrlRewriter("/", 0).rewrite("/"), "./")
+        self.assertNotEqual(UrlRewriter("/", 1).key, UrlRewriter("/", 2).key)
+        self.assertNotEqual(UrlRewriter("/a/").key, UrlRewriter("/b/").key)
+
+    def test_asset_map(self):
+        assets = AssetMap({"/index.css": "/index.3f9a1c2b.css"})
+        rewriter = UrlRewriter("/site/", None, assets)
+        self.assertEqual(rewriter.rewrite("/index.css"), "/site/index.3f9a1c2b.css")
+        self.assertEqual(
+            rewriter.rewrite("/index.css?v=1#top"), "/site/index.3f9a1c2b.css?v=1#top"
+        )
+        self.assertEqual(rewriter.rewrite("/other.css"), "/site/other.css")
+        self.assertNotEqual(rewriter.key, UrlRewriter("/site/").key)
+        self.assertNotEqual(rewriter.key, UrlRewriter("/site/", None, AssetMap({})).key)
+
+    def test_records_links(self):
+        links = []
+        rewriter = UrlRewriter("/site/", None, None, links)
+        md = "[home](/) [ext](https://boot.dev) ![a](/a.png)"
+        markdown_to_html_node(md, rewriter.rewrite)
+        rewriter.rewrite_html('<link href="/index.css">')
+        self.assertEqual(links, ["/", "/a.png"])
+
+    def test_rewrite_html(self):
+        rewriter = UrlRewriter("/site/")
+        self.assertEqual(
+            rewriter.rewrite_html('<link href="/index.css" /><a href="https://x.dev">'),
+            '<link href="/site/index.css" /><a href="https://x.dev">',
+        )
+
+    def test_only_links_and_images_are_rewritten(self):
+        md = """
+[home](/) and ![image](/a.png) and `href="/code"`
+
+```
+<a href="/in/code/block">
+```
+"""
+        html = markdown_to_html_node(md, UrlRewriter("/site/").rewrite).to_html()
+        self.assertEqual(
+            html,
+            '<div><p><a href="/site/">home</a> and <img src="/site/a.png" alt="image"></img> and <code>href="/code"</code></p><pre><code><a href="/in/code/block">\n</code></pre></div>',
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,29 @@
+import os
+import tempfile
+import unittest
+
+from watch import snapshot, changed_paths
+
+
+class TestWatch(unittest.TestCase):
+    def test_snapshot_changes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            content = os.path.join(tmp, "content")
+            os.makedirs(os.path.join(content, "blog"))
+            page = os.path.join(content, "blog", "index.md")
+            template = os.path.join(tmp, "template.html")
+            for path in (page, template):
+                with open(path, "w") as f:
+                    f.write("x")
+            paths = [content, template, os.path.join(tmp, "missing")]
+            before = snapshot(paths)
+            self.assertEqual(sorted(before), [page, template])
+
+            with open(page, "a") as f:
+                f.write("more")
+            os.remove(template)
+            self.assertEqual(changed_paths(before, snapshot(paths)), [page, template])
+
+
+if __name__ == "__main__":
+    unittest.main()
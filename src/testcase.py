@@ -0,0 +1,22 @@
+import os, tempfile, unittest
+
+
+# A test case with a temporary directory, self.dir, that is removed after each test
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    # Writes text or bytes to a file, creating its directories. Relative paths are
+    # relative to the temporary directory. Returns the path of the file.
+    def write(self, path, data):
+        path = os.path.join(self.dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb" if isinstance(data, bytes) else "w") as f:
+            f.write(data)
+        return path
+
+    def read(self, path):
+        with open(os.path.join(self.dir, path)) as f:
+            return f.read()
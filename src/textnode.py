@@ -1,5 +1,9 @@
+import re
 from enum import Enum
+from io import StringIO
+from htmlnode import render_to
 from leafnode import LeafNode
+from parentnode import ParentNode
 
 
 class TextType(Enum):
@@ -11,24 +15,69 @@ class TextType(Enum):
     IMAGE = "image"
 
 
+# HTML tags of the text types rendered as a simple element
+TEXT_TYPE_TAGS = {
+    TextType.BOLD: "b",
+    TextType.ITALIC: "i",
+    TextType.CODE: "code",
+}
+
+
+# Text nodes are rendered to HTML directly, without converting them to LeafNodes first
 class TextNode:
-    def __init__(self, text, text_type, url=None):
+    __slots__ = ("text", "text_type", "url", "children")
+
+    def __init__(self, text, text_type, url=None, children=None):
         self.text = text
         self.text_type = text_type
         self.url = url
+        self.children = children  # None: no nested formatting
 
     def __eq__(self, other):
         return (
             self.text_type == other.text_type
             and self.text == other.text
             and self.url == other.url
+            and self.children == other.children
         )
 
+    def to_html(self):
+        buffer = StringIO()
+        render_to(self, buffer)
+        return buffer.getvalue()
+
+    # Renders the node like text_node_to_html_node(node).render_step would
+    def render_step(self, write, stack):
+        text_type = self.text_type
+        if text_type == TextType.TEXT:
+            write(self.text)
+        elif text_type == TextType.LINK:
+            write(f'<a href="{self.url}">{self.text}</a>')
+        elif text_type == TextType.IMAGE:
+            write(f'<img src="{self.url}" alt="{self.text}"></img>')
+        elif text_type in TEXT_TYPE_TAGS:
+            tag = TEXT_TYPE_TAGS[text_type]
+            if self.children:
+                write(f"<{tag}>")
+                stack.append(f"</{tag}>")
+                stack.extend(reversed(self.children))
+            else:
+                write(f"<{tag}>{self.text}</{tag}>")
+        else:
+            raise Exception("Not a valid text type")
+
     def __repr__(self):
+        if self.children:
+            return f"TextNode({self.text}, {self.text_type.value}, {self.url}, {self.children})"
         return f"TextNode({self.text}, {self.text_type.value}, {self.url})"
 
 
 def text_node_to_html_node(text_node):
+    # Nested formatting becomes a parent node wrapping the converted children
+    if text_node.children:
+        parent = text_node_to_html_node(TextNode("", text_node.text_type))
+        children = [text_node_to_html_node(child) for child in text_node.children]
+        return ParentNode(parent.tag, children)
     match text_node.text_type:
         case TextType.TEXT:
             return LeafNode(None, text_node.text)
@@ -193,15 +242,93 @@ def split_nodes_link(old_nodes):
     return new_nodes
 
 
-# This function parses raw markdown text into TextNode objects
-def text_to_textnodes(text):
-    # Transform text into a single node
-    nodes = [TextNode(text, TextType.TEXT)]
-    # Handle delimiters
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
-    # Handle links and images
-    nodes = split_nodes_link(nodes)
-    nodes = split_nodes_image(nodes)
+# Characters that can start inline markup
+INLINE_SPECIAL = re.compile(r"[`*_!\[]")
+EMPHASIS_DELIMITERS = {"**": TextType.BOLD, "_": TextType.ITALIC}
+
+
+# Closes an emphasis span, only keeping the children when they contain nested formatting
+def emphasis_node(text_type, children):
+    if all(child.text_type == TextType.TEXT for child in children):
+        return TextNode("".join(child.text for child in children), text_type)
+    text = "".join(child.text for child in children)
+    return TextNode(text, text_type, None, children)
+
+
+# This function parses raw markdown text into TextNode objects.
+# The text is scanned once from left to right, jumping between characters that can
+# start markup. Open bold and italic spans are kept on a stack, so nested emphasis
+# such as **_text_** is supported. Code spans, links and images are not nested into.
+# If rewrite_url is given, the URL of every link and image is passed through it.
+def text_to_textnodes(text, rewrite_url=None):
+    # Stack of open spans as (text type, nodes inside the span)
+    stack = [(TextType.TEXT, [])]
+    nodes = stack[0][1]
+    start_idx = 0  # Start of the plain text not yet added to nodes
+    # The last found "](" and ")" positions are reused between links, so a line full of
+    # unclosed brackets is still scanned in linear time
+    bracket_close = paren_close = -2
+    match = INLINE_SPECIAL.search(text)
+
+    while match:
+        i = match.start()
+        char = text[i]
+        node = None
+        end_idx = None
+
+        if char == "`":
+            code_end = text.find("`", i + 1)
+            if code_end == -1:
+                raise ValueError("Delimiter is not paired")
+            node = TextNode(text[i + 1 : code_end], TextType.CODE)
+            end_idx = code_end + 1
+
+        elif char == "_" or text.startswith("**", i):
+            delimiter = "_" if char == "_" else "**"
+            if i > start_idx:
+                nodes.append(TextNode(text[start_idx:i], TextType.TEXT))
+            text_type = EMPHASIS_DELIMITERS[delimiter]
+            if stack[-1][0] == text_type:
+                children = stack.pop()[1]
+                stack[-1][1].append(emphasis_node(text_type, children))
+            else:
+                stack.append((text_type, []))
+            nodes = stack[-1][1]
+            start_idx = i + len(delimiter)
+            match = INLINE_SPECIAL.search(text, start_idx)
+            continue
+
+        elif char == "[" or (char == "!" and text.startswith("[", i + 1)):
+            label_start = i + 1 if char == "[" else i + 2
+            if -1 < bracket_close < label_start:
+                bracket_close = -2
+            if bracket_close == -2:
+                bracket_close = text.find("](", label_start)
+                paren_close = -2
+            if bracket_close != -1:
+                if paren_close == -2:
+                    paren_close = text.find(")", bracket_close + 2)
+                if paren_close != -1:
+                    text_type = TextType.LINK if char == "[" else TextType.IMAGE
+                    url = text[bracket_close + 2 : paren_close]
+                    if rewrite_url:
+                        url = rewrite_url(url)
+                    node = TextNode(text[label_start:bracket_close], text_type, url)
+                    end_idx = paren_close + 1
+                    bracket_close = paren_close = -2
+
+        if node:
+            if i > start_idx:
+                nodes.append(TextNode(text[start_idx:i], TextType.TEXT))
+            nodes.append(node)
+            start_idx = end_idx
+            match = INLINE_SPECIAL.search(text, end_idx)
+        else:
+            # Not markup after all, keep it as plain text
+            match = INLINE_SPECIAL.search(text, i + 1)
+
+    if len(stack) > 1:
+        raise ValueError("Delimiter is not paired")
+    if start_idx < len(text):
+        nodes.append(TextNode(text[start_idx:], TextType.TEXT))
     return nodes
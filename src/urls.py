@@ -0,0 +1,77 @@
+import re, hashlib
+
+# Matches root-relative href and src attributes in template HTML
+ATTRIBUTE_URL_PATTERN = re.compile(r'\b(href|src)="(/[^"]*)"')
+
+
+# Maps the root-relative URLs of assets to their fingerprinted URLs,
+# such as "/index.css" to "/index.3f9a1c2b.css"
+class AssetMap:
+    def __init__(self, urls):
+        self.urls = urls
+        # Pages and templates are rewritten again whenever the digest changes
+        self.digest = hashlib.sha256(
+            "\0".join(f"{url}\0{urls[url]}" for url in sorted(urls)).encode()
+        ).hexdigest()
+
+    def get(self, url):
+        return self.urls.get(url)
+
+    def __repr__(self):
+        return f"AssetMap({self.urls})"
+
+
+# Rewrites the root-relative URLs of a page ("/images/tom.png") when they are created.
+# By default the leading "/" is replaced with the basepath. In relative mode the URLs
+# are made relative to the page instead, with depth being the number of directories
+# between the output root and the page.
+# URLs of assets in asset_map (an AssetMap) are replaced with their fingerprinted URLs.
+# If links is a list, the root-relative URLs of the links and images passed to rewrite
+# are appended to it, as they were written in the source.
+class UrlRewriter:
+    def __init__(self, basepath="/", depth=None, asset_map=None, links=None):
+        self.basepath = basepath
+        self.depth = depth
+        self.asset_map = asset_map
+        self.links = links
+
+    # Identifies the rewriting, pages rewritten with the same key get the same URLs
+    @property
+    def key(self):
+        if self.depth is None:
+            key = f"base:{self.basepath}"
+        else:
+            key = f"relative:{self.depth}"
+        if self.asset_map:
+            key += f":assets:{self.asset_map.digest}"
+        return key
+
+    # Rewrites the URL of a link or image of the page
+    def rewrite(self, url):
+        if self.links is not None and url.startswith("/") and not url.startswith("//"):
+            self.links.append(url)
+        return self.resolve(url)
+
+    def resolve(self, url):
+        # External, protocol-relative and page-relative URLs are left alone
+        if not url.startswith("/") or url.startswith("//"):
+            return url
+        if self.asset_map:
+            # The query string and fragment are kept after the fingerprinted path
+            path = url.split("?", 1)[0].split("#", 1)[0]
+            fingerprinted = self.asset_map.get(path)
+            if fingerprinted:
+                url = fingerprinted + url[len(path) :]
+        if self.depth is None:
+            return self.basepath + url[1:]
+        return ("../" * self.depth or "./") + url[1:]
+
+    # Rewrites the href and src attributes of a piece of HTML, such as a template.
+    # They are not recorded in links, as they are not part of a page's content.
+    def rewrite_html(self, html):
+        return ATTRIBUTE_URL_PATTERN.sub(
+            lambda match: f'{match.group(1)}="{self.resolve(match.group(2))}"', html
+        )
+
+    def __repr__(self):
+        return f"UrlRewriter({self.basepath}, {self.depth})"
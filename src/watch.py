@@ -0,0 +1,77 @@
+import os, time, traceback
+from discover import scan_tree
+from serve import SiteCache, ReloadNotifier, inject_reload_script, start_server
+
+
+# Returns {path: (mtime_ns, size)} for every file under the watched paths.
+# Paths can be files or directories, missing paths are ignored.
+def snapshot(paths):
+    files = {}
+    for path in paths:
+        if os.path.isfile(path):
+            st = os.stat(path)
+            files[path] = (st.st_mtime_ns, st.st_size)
+        elif os.path.isdir(path):
+            for source in scan_tree(path):
+                files[source.path] = (source.mtime_ns, source.size)
+    return files
+
+
+# Returns the paths that were added, removed or modified between two snapshots
+def changed_paths(old, new):
+    return sorted(
+        path for path in old.keys() | new.keys() if old.get(path) != new.get(path)
+    )
+
+
+# Polls the watched paths until something changes, then waits until nothing has
+# changed for the debounce time, so a burst of saves triggers a single rebuild.
+# Returns the new snapshot and the changed paths.
+def wait_for_changes(paths, previous, interval=0.2, debounce=0.1):
+    while True:
+        time.sleep(interval)
+        current = snapshot(paths)
+        if current != previous:
+            break
+    while True:
+        time.sleep(debounce)
+        settled = snapshot(paths)
+        if settled == current:
+            return settled, changed_paths(previous, settled)
+        current = settled
+
+
+# Watches the given paths and calls rebuild after every change. rebuild is given a dict
+# to add the outputs it writes to (see SiteCache.refresh). The output directory is
+# served from memory on the given port and refreshed with them after every rebuild.
+# With live_reload, pages reload in the connected
+# browsers after every rebuild. A failing rebuild is reported and the watcher keeps
+# running.
+def watch(paths, rebuild, directory, port, interval=0.2, live_reload=True):
+    notifier = ReloadNotifier() if live_reload else None
+    site = SiteCache(directory, inject_reload_script if live_reload else None)
+    server = start_server(site, port, notifier)
+    print(f"Serving {directory}/ on http://localhost:{server.server_port}/")
+    print(f"Watching {', '.join(paths)} for changes, press Ctrl+C to stop")
+    files = snapshot(paths)
+    try:
+        while True:
+            files, changed = wait_for_changes(paths, files, interval)
+            print(f"Changed: {', '.join(changed)}")
+            start = time.perf_counter()
+            written = {}
+            try:
+                rebuild(written)
+            except Exception:
+                traceback.print_exc()
+                # The outputs written before the failure are not all known
+                site.refresh()
+                continue
+            elapsed = time.perf_counter() - start
+            print(f"Rebuilt in {elapsed:.3f}s, {site.refresh(written)} files changed")
+            if notifier:
+                notifier.notify()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()